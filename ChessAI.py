@@ -2,76 +2,25 @@
 Handling the AI moves.
 Có sử dụng thuật toán Negamax và cắt tỉa Alpha-beta
 """
+import math
 import random
+import threading
+import time
+from array import array
 
-piece_score = {"K": 0, "Q": 9, "R": 5, "B": 3, "N": 3, "p": 1}
-#Đánh giá mức độ quan trọng của từng quân cờ (VD: 0 là không thể để mất,Q là quan trọng nhất và chỉ mang tính tương đối)
-
-knight_scores = [[0.0, 0.1, 0.2, 0.2, 0.2, 0.2, 0.1, 0.0],
-                 [0.1, 0.3, 0.5, 0.5, 0.5, 0.5, 0.3, 0.1],
-                 [0.2, 0.5, 0.6, 0.65, 0.65, 0.6, 0.5, 0.2],
-                 [0.2, 0.55, 0.65, 0.7, 0.7, 0.65, 0.55, 0.2],
-                 [0.2, 0.5, 0.65, 0.7, 0.7, 0.65, 0.5, 0.2],
-                 [0.2, 0.55, 0.6, 0.65, 0.65, 0.6, 0.55, 0.2],
-                 [0.1, 0.3, 0.5, 0.55, 0.55, 0.5, 0.3, 0.1],
-                 [0.0, 0.1, 0.2, 0.2, 0.2, 0.2, 0.1, 0.0]]
-
-bishop_scores = [[0.0, 0.2, 0.2, 0.2, 0.2, 0.2, 0.2, 0.0],
-                 [0.2, 0.4, 0.4, 0.4, 0.4, 0.4, 0.4, 0.2],
-                 [0.2, 0.4, 0.5, 0.6, 0.6, 0.5, 0.4, 0.2],
-                 [0.2, 0.5, 0.5, 0.6, 0.6, 0.5, 0.5, 0.2],
-                 [0.2, 0.4, 0.6, 0.6, 0.6, 0.6, 0.4, 0.2],
-                 [0.2, 0.6, 0.6, 0.6, 0.6, 0.6, 0.6, 0.2],
-                 [0.2, 0.5, 0.4, 0.4, 0.4, 0.4, 0.5, 0.2],
-                 [0.0, 0.2, 0.2, 0.2, 0.2, 0.2, 0.2, 0.0]]
-
-rook_scores = [[0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25],
-               [0.5, 0.75, 0.75, 0.75, 0.75, 0.75, 0.75, 0.5],
-               [0.0, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.0],
-               [0.0, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.0],
-               [0.0, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.0],
-               [0.0, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.0],
-               [0.0, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.0],
-               [0.25, 0.25, 0.25, 0.5, 0.5, 0.25, 0.25, 0.25]]
-
-queen_scores = [[0.0, 0.2, 0.2, 0.3, 0.3, 0.2, 0.2, 0.0],
-                [0.2, 0.4, 0.4, 0.4, 0.4, 0.4, 0.4, 0.2],
-                [0.2, 0.4, 0.5, 0.5, 0.5, 0.5, 0.4, 0.2],
-                [0.3, 0.4, 0.5, 0.5, 0.5, 0.5, 0.4, 0.3],
-                [0.4, 0.4, 0.5, 0.5, 0.5, 0.5, 0.4, 0.3],
-                [0.2, 0.5, 0.5, 0.5, 0.5, 0.5, 0.4, 0.2],
-                [0.2, 0.4, 0.5, 0.4, 0.4, 0.4, 0.4, 0.2],
-                [0.0, 0.2, 0.2, 0.3, 0.3, 0.2, 0.2, 0.0]]
-
-pawn_scores = [[0.8, 0.8, 0.8, 0.8, 0.8, 0.8, 0.8, 0.8],
-               [0.7, 0.7, 0.7, 0.7, 0.7, 0.7, 0.7, 0.7],
-               [0.3, 0.3, 0.4, 0.5, 0.5, 0.4, 0.3, 0.3],
-               [0.25, 0.25, 0.3, 0.45, 0.45, 0.3, 0.25, 0.25],
-               [0.2, 0.2, 0.2, 0.4, 0.4, 0.2, 0.2, 0.2],
-               [0.25, 0.15, 0.1, 0.2, 0.2, 0.1, 0.15, 0.25],
-               [0.25, 0.3, 0.3, 0.0, 0.0, 0.3, 0.3, 0.25],
-               [0.2, 0.2, 0.2, 0.2, 0.2, 0.2, 0.2, 0.2]]
-
-piece_position_scores = {"wN": knight_scores,
-                         "bN": knight_scores[::-1],
-                         "wB": bishop_scores,
-                         "bB": bishop_scores[::-1],
-                         "wQ": queen_scores,
-                         "bQ": queen_scores[::-1],
-                         "wR": rook_scores,
-                         "bR": rook_scores[::-1],
-                         "wp": pawn_scores,
-                         "bp": pawn_scores[::-1]}
+from ChessEngine import EVALUATION_SCALE, piece_score  # the piece values live next to the incremental evaluation
 
 CHECKMATE = 1000
 STALEMATE = 0
 
 # ===== CẤU HÌNH ĐỘ KHÓ AI =====
+# depth: độ sâu tối đa của iterative deepening, time: số giây tối đa cho mỗi nước đi
+# null_move / lmr: bật null-move pruning và late move reductions
 DIFFICULTY_LEVELS = {
-    'easy': {'name': 'Easy', 'depth': 1, 'emoji': '😊'},
-    'medium': {'name': 'Medium', 'depth': 2, 'emoji': '🤔'},
-    'hard': {'name': 'Hard', 'depth': 3, 'emoji': '😤'},
-    'very_hard': {'name': 'Very Hard', 'depth': 4, 'emoji': '🔥'}
+    'easy': {'name': 'Easy', 'depth': 1, 'time': 0.5, 'null_move': False, 'lmr': False, 'emoji': '😊'},
+    'medium': {'name': 'Medium', 'depth': 2, 'time': 1.0, 'null_move': False, 'lmr': False, 'emoji': '🤔'},
+    'hard': {'name': 'Hard', 'depth': 3, 'time': 2.0, 'null_move': True, 'lmr': True, 'emoji': '😤'},
+    'very_hard': {'name': 'Very Hard', 'depth': 6, 'time': 5.0, 'null_move': True, 'lmr': True, 'emoji': '🔥'}
 }
 DIFFICULTY_ORDER = ['easy', 'medium', 'hard', 'very_hard']
 current_difficulty = 'hard'  # Mặc định
@@ -97,66 +46,938 @@ def set_difficulty(level):
         current_difficulty = level
 
 
-def findBestMove(game_state, valid_moves, return_queue):
-    global next_move, max_depth
-    next_move = None
-    random.shuffle(valid_moves)
-    max_depth = DIFFICULTY_LEVELS[current_difficulty]['depth']
-    findMoveNegaMaxAlphaBeta(game_state, valid_moves, max_depth, -CHECKMATE, CHECKMATE,
-                             1 if game_state.white_to_move else -1)
-    return_queue.put(next_move)
-
-
-def findMoveNegaMaxAlphaBeta(game_state, valid_moves, depth, alpha, beta, turn_multiplier):
-    global next_move, max_depth
-    if depth == 0:
-        return turn_multiplier * scoreBoard(game_state)
-    # move ordering - implement later //TODO
-    max_score = -CHECKMATE
-    for move in valid_moves:
-        game_state.makeMove(move)
-        next_moves = game_state.getValidMoves()
-        score = -findMoveNegaMaxAlphaBeta(game_state, next_moves, depth - 1, -beta, -alpha, -turn_multiplier)
-        if score > max_score:
-            max_score = score
-            if depth == max_depth:
-                next_move = move
-        game_state.undoMove()
-        if max_score > alpha:
-            alpha = max_score
-        if alpha >= beta:
-            break
-    return max_score
+# ===== BẢNG CHUYỂN VỊ (TRANSPOSITION TABLE) =====
+TT_SIZE_MB = 16  # kích thước bảng chuyển vị
+
+# bound type of a stored score
+TT_EXACT = 0
+TT_LOWER_BOUND = 1  # the search failed high, the real score is at least this
+TT_UPPER_BOUND = 2  # the search failed low, the real score is at most this
+TT_SCORE_SCALE = 10000  # scores are stored as whole 1/10000 pawns
+TT_SCORE_OFFSET = 1 << 33  # keeps the stored score positive
 
 
-def scoreBoard(game_state):
+class TranspositionTable:
     """
-    Score the board. A positive score is good for white, a negative score is good for black.
+    Fixed-size table of search results keyed by Zobrist key.
+    Every bucket has two slots: the first keeps the deepest result (replaced only by an equal or deeper search,
+    or by any search once it is left over from an earlier move), the second is always replaced.
+    A slot is two 64-bit words, the key and a packed data word (move id | bound << 12 | depth << 14 | age << 22
+    | score << 30). The key word is stored XORed with the data word, so an entry half overwritten by another
+    process sharing the table no longer matches its key and is ignored instead of read as garbage.
     """
-    if game_state.checkmate:
-        if game_state.white_to_move:
-            return -CHECKMATE  # black wins
+    ENTRY_BYTES = 16
+
+    def __init__(self, size_mb=TT_SIZE_MB, shared_memory=None):
+        buckets = self.bucketCount(size_mb)
+        self.size_mb = size_mb
+        self.bucket_mask = buckets - 1
+        self.shared_memory = shared_memory
+        if shared_memory is None:
+            self.keys = array("Q", bytes(16 * buckets))
+            self.data = array("Q", bytes(16 * buckets))
+        else:
+            # the first half of the segment holds the keys, the second half the data words
+            self.keys = shared_memory.buf[:16 * buckets].cast("Q")
+            self.data = shared_memory.buf[16 * buckets:32 * buckets].cast("Q")
+        self.age = 1
+        self.hits = 0
+        self.misses = 0
+        self.overwrites = 0
+
+    @classmethod
+    def bucketCount(cls, size_mb):
+        """
+        Number of buckets of a table of size_mb megabytes: the largest power of two that fits.
+        """
+        buckets = 1
+        while buckets * 4 * cls.ENTRY_BYTES <= size_mb * 1024 * 1024:
+            buckets *= 2
+        return buckets
+
+    @classmethod
+    def createShared(cls, size_mb=TT_SIZE_MB):
+        """
+        Table in a new multiprocessing.shared_memory segment, for searches running in several processes.
+        The creator calls close(unlink=True) when done.
+        """
+        from multiprocessing import shared_memory
+        segment = shared_memory.SharedMemory(create=True, size=cls.bucketCount(size_mb) * 2 * cls.ENTRY_BYTES)
+        segment.buf[:] = bytes(len(segment.buf))
+        return cls(size_mb, segment)
+
+    @classmethod
+    def attachShared(cls, name, size_mb):
+        """
+        Table backed by a segment made by createShared in another process.
+        """
+        from multiprocessing import shared_memory
+        return cls(size_mb, shared_memory.SharedMemory(name=name))
+
+    def close(self, unlink=False):
+        if self.shared_memory is not None:
+            self.keys.release()
+            self.data.release()
+            self.shared_memory.close()
+            if unlink:
+                self.shared_memory.unlink()
+            self.shared_memory = None
+
+    def newSearch(self):
+        """
+        Called once per move searched: entries from earlier searches become free to replace.
+        """
+        self.age = self.age % 255 + 1
+
+    def clear(self):
+        if self.shared_memory is None:
+            self.keys = array("Q", bytes(8 * len(self.keys)))
+            self.data = array("Q", bytes(8 * len(self.data)))
         else:
-            return CHECKMATE  # white wins
-    elif game_state.stalemate:
-        return STALEMATE #Hòa
-    #Chưa hiểu tạo score làm gì
-    score = 0 #Nếu không có tình huống checkmate hay stalemate thì khởi tạo score
-    for row in range(len(game_state.board)):
-        for col in range(len(game_state.board[row])):
-            piece = game_state.board[row][col]
-            if piece != "--":
-                piece_position_score = 0
-                if piece[1] != "K":
-                    piece_position_score = piece_position_scores[piece][row][col]
-                if piece[0] == "w":
-                    score += piece_score[piece[1]] + piece_position_score
-                if piece[0] == "b":
-                    score -= piece_score[piece[1]] + piece_position_score
+            self.shared_memory.buf[:len(self.keys) * 16] = bytes(len(self.keys) * 16)
+        self.hits = self.misses = self.overwrites = 0
+
+    def probe(self, key):
+        """
+        (depth, bound, score, move_id) stored for the position, or None.
+        """
+        index = (key & self.bucket_mask) << 1
+        keys = self.keys
+        data = self.data
+        entry = data[index]
+        if keys[index] ^ entry != key or not entry:
+            index += 1
+            entry = data[index]
+            if keys[index] ^ entry != key or not entry:
+                self.misses += 1
+                return None
+        self.hits += 1
+        return ((entry >> 14) & 0xFF, (entry >> 12) & 0b11,
+                ((entry >> 30) - TT_SCORE_OFFSET) / TT_SCORE_SCALE, entry & 0xFFF)
+
+    def store(self, key, depth, bound, score, move_id):
+        index = (key & self.bucket_mask) << 1
+        keys = self.keys
+        data = self.data
+        slot_data = data[index]
+        if (keys[index] ^ slot_data != key and slot_data and ((slot_data >> 14) & 0xFF) > depth and
+                ((slot_data >> 22) & 0xFF) == self.age):
+            index += 1  # the deeper entry from this search stays, use the always-replace slot
+            slot_data = data[index]
+        if slot_data and keys[index] ^ slot_data != key:
+            self.overwrites += 1
+        entry = (move_id | (bound << 12) | (depth << 14) | (self.age << 22) |
+                 ((round(score * TT_SCORE_SCALE) + TT_SCORE_OFFSET) << 30))
+        data[index] = entry
+        keys[index] = key ^ entry
+
+    def usage(self):
+        """
+        Share of the slots in use, in permille (sampled from the first 1000 slots).
+        """
+        sample = min(1000, len(self.data))
+        return sum(1 for index in range(sample) if self.data[index]) * 1000 // sample
+
+    def getStats(self):
+        return {"hits": self.hits, "misses": self.misses, "overwrites": self.overwrites, "usage": self.usage()}
+
+
+# ===== QUẢN LÝ THỜI GIAN =====
+DEFAULT_MOVES_TO_GO = 30  # moves still to play when the clock has no move count
+TIME_CHECK_INTERVAL = 1024  # nodes between two looks at the clock (must be a power of two)
+
+
+def allocateTime(remaining=None, increment=0.0, moves_to_go=None, difficulty=None):
+    """
+    Seconds to spend on this move. Without a clock (remaining=None) this is the 'time' of the difficulty
+    (current_difficulty by default), otherwise an even share of the remaining time plus most of the increment,
+    never more than half the clock.
+    """
+    if remaining is None:
+        return DIFFICULTY_LEVELS[difficulty or current_difficulty]['time']
+    budget = remaining / (moves_to_go or DEFAULT_MOVES_TO_GO) + increment * 0.8
+    return max(0.01, min(budget, remaining * 0.5))
+
+
+# ===== PVS & ASPIRATION WINDOWS =====
+USE_PVS = True  # moves after the first are searched with a null window and re-searched if they fail high
+NULL_WINDOW = 0.01  # width of the null window, scores are in pawns
+USE_ASPIRATION = True  # each depth from ASPIRATION_MIN_DEPTH opens a window around the previous score
+ASPIRATION_MIN_DEPTH = 3
+ASPIRATION_WINDOW = 0.5  # half-width of the first window in pawns, doubled after every fail
+
+# ===== NULL MOVE & LATE MOVE REDUCTIONS =====
+NULL_MOVE_MIN_DEPTH = 3
+LMR_MIN_DEPTH = 3
+LMR_MIN_MOVES = 3  # moves searched at full depth before quiet moves get reduced
+# LMR_REDUCTIONS[depth][move number]: grows with the log of both
+LMR_REDUCTIONS = [[0] * 64] + [[0] + [int(0.75 + math.log(depth) * math.log(move_number) / 2.25)
+                                      for move_number in range(1, 64)] for depth in range(1, 64)]
 
+# ===== QUIESCENCE SEARCH =====
+DELTA_MARGIN = 2  # a capture must be able to bring the score within this many pawns of alpha
+
+# ===== SẮP XẾP NƯỚC ĐI =====
+MAX_PLY = 128
+
+
+def captureScore(move):
+    """
+    MVV-LVA: the most valuable victim first, the least valuable attacker first among equal victims.
+    """
+    score = piece_score[move.piece_captured[1]] * 10 - piece_score[move.piece_moved[1]] if move.is_capture else 0
+    if move.is_pawn_promotion:
+        score += piece_score["Q"] * 10
     return score
 
 
+# ===== TÌM KIẾM SONG SONG =====
+SEARCH_THREADS = 1  # số tiến trình tìm kiếm song song (Lazy SMP khi > 1)
+ROOT_SPLIT_WORKERS = 0  # số tiến trình chia nhau các nước đi gốc (0: tắt)
+ROOT_SPLIT_EPSILON = 0.001  # below the smallest score step (0.05 pawn), so ties with alpha still get exact scores
+ROOT_SPLIT_POLL_INTERVAL = 0.01  # seconds between two looks at the stop signal while the pool works
+HELPER_POLL_INTERVAL = 0.01  # seconds between two looks at the Lazy SMP helpers while waiting for their results
+root_split_searcher = None  # the searcher of a root split pool worker
+root_split_state = None  # the pool worker's copy of the position
+root_split_record = None  # to_bytes record root_split_state was loaded from
+
+
+class SearchResult:
+    """
+    Outcome of a search: the move to play, its score for the side to move, the principal variation, the last
+    completed depth, and the nodes and seconds spent. stopped is True when the deadline, the node budget or the
+    stop signal cut the last depth short; if not even depth 1 completed, move is the best root move found so far
+    (depth 0, empty pv). error describes why a search could not run (see ChessWorker), move is then None.
+    """
+
+    def __init__(self, move, score, pv, depth, nodes, quiescence_nodes, helper_nodes, elapsed, stopped=False,
+                 error=None):
+        self.move = move
+        self.score = score
+        self.pv = pv
+        self.depth = depth
+        self.nodes = nodes  # main search nodes, root split workers included
+        self.quiescence_nodes = quiescence_nodes
+        self.helper_nodes = helper_nodes  # nodes of the Lazy SMP helper processes
+        self.elapsed = elapsed
+        self.stopped = stopped
+        self.error = error
+
+    def __repr__(self):
+        return (f"SearchResult(move={self.move}, score={self.score:.2f}, depth={self.depth}, "
+                f"pv={' '.join(str(move) for move in self.pv)}, nodes={self.nodes + self.quiescence_nodes}, "
+                f"stopped={self.stopped})")
+
+
+class Searcher:
+    """
+    Negamax alpha-beta search with iterative deepening. A searcher owns its settings, transposition table,
+    killer and history tables, node counters and stop flag, so several searches can run in one process
+    (one searcher per game, or per thread) without sharing any state.
+    The search can be cancelled from another thread with stop(), or from another process by setting the
+    multiprocessing.Event given as stop_event: it is looked at every TIME_CHECK_INTERVAL nodes, the search
+    unwinds and returns its best move so far. The searcher's own event is cleared by every search; an event
+    given by the caller stays set until the caller clears it.
+    """
+
+    def __init__(self, difficulty=None, transposition_table=None, use_pvs=None, use_aspiration=None,
+                 stop_event=None):
+        self.difficulty = difficulty  # key of DIFFICULTY_LEVELS, None follows current_difficulty
+        self.transposition_table = transposition_table if transposition_table is not None else TranspositionTable()
+        self.use_pvs = USE_PVS if use_pvs is None else use_pvs
+        self.use_aspiration = USE_ASPIRATION if use_aspiration is None else use_aspiration
+        self.use_null_move = False  # set from the difficulty by every search
+        self.use_lmr = False
+        # reproducible mode: no pruning whose result depends on the window or on the table, so that every root
+        # move that beats alpha gets the same exact score however the work is split (see rootSplitSearch)
+        self.deterministic = False
+        self.stop_event = stop_event if stop_event is not None else threading.Event()
+        self.own_stop_event = stop_event is None  # cleared at the start of every search
+        self.helper_stop_event = None  # multiprocessing.Event that ends the other processes of a parallel search
+        self.root_split_alpha = None  # multiprocessing.Value with the best root score of a root split search
+        self.root_split_stop_event = None  # multiprocessing.Event of the root split pool workers
+        self.root_split_pool = None  # ProcessPoolExecutor kept between root split searches, see close()
+        self.root_split_workers = 0
+        self.root_split_line = None  # move ids after the root split best move, None when it was searched here
+        self.killer_moves = [[0, 0] for _ in range(MAX_PLY)]  # two quiet move ids per ply that caused a cutoff
+        self.history_scores = [[0] * 4096, [0] * 4096]  # [white, black][move id], raised by quiet cutoffs
+        self.root_ply = 0  # game_state.ply at the root of the current search
+        self.max_depth = 0
+        self.next_move = None
+        self.nodes_searched = 0  # nodes of the main search
+        self.quiescence_nodes = 0  # nodes of the quiescence search, counted apart
+        self.helper_nodes = 0  # nodes searched by the helper processes of the last Lazy SMP search
+        self.search_deadline = None  # perf_counter() value at which the search stops, None for no limit
+        self.node_limit = math.inf  # nodes (main and quiescence together) after which the search stops
+        self.search_stopped = False
+
+    def search(self, game_state, valid_moves=None, time_limit=None, nodes=None, max_search_depth=None,
+               threads=None, root_split_workers=None, reproducible=False, stop_event=None, remaining=None,
+               increment=0.0, moves_to_go=None):
+        """
+        Iterative deepening: search depth 1, 2, ... up to the difficulty depth (or max_search_depth) until the time
+        or node budget runs out, and return the SearchResult of the last completed depth.
+        Without time_limit the time comes from the clock, remaining seconds plus increment per move (see
+        allocateTime), or from the difficulty when there is no clock.
+        With more than one thread (SEARCH_THREADS by default) the search runs as Lazy SMP over several processes.
+        With root_split_workers (ROOT_SPLIT_WORKERS by default) the root moves are shared out to a process pool
+        instead; that search is reproducible and plays the same move as reproducible=True in one process.
+        stop_event replaces the searcher's stop signal for this search and is left to the caller to clear.
+        """
+        start_time = time.perf_counter()
+        if valid_moves is None:
+            valid_moves = game_state.getValidMoves()
+        if time_limit is None:
+            time_limit = allocateTime(remaining, increment, moves_to_go, self.difficulty)
+        if threads is None:
+            threads = SEARCH_THREADS
+        if root_split_workers is None:
+            root_split_workers = ROOT_SPLIT_WORKERS
+        self.helper_nodes = 0
+        saved_stop_event = self.stop_event
+        if stop_event is not None:
+            self.stop_event = stop_event
+        elif self.own_stop_event:
+            self.stop_event.clear()  # a stop() of an earlier search must not end this one
+        try:
+            if root_split_workers > 0:
+                best_move, score, depth, pv = self.rootSplitSearch(game_state, valid_moves, root_split_workers,
+                                                                   time_limit, nodes, max_search_depth)
+            elif threads > 1 and not reproducible:
+                best_move, score, depth, pv = self.lazySmpSearch(game_state, valid_moves, threads, time_limit,
+                                                                 nodes, max_search_depth)
+            else:
+                best_move, score, depth = self.iterativeDeepening(game_state, valid_moves, time_limit, nodes,
+                                                                  max_search_depth, reproducible=reproducible)
+                pv = self.principalVariation(game_state, best_move, depth)
+        finally:
+            self.stop_event = saved_stop_event
+        return SearchResult(best_move, score, pv, depth, self.nodes_searched, self.quiescence_nodes,
+                            self.helper_nodes, time.perf_counter() - start_time, self.search_stopped)
+
+    def stop(self):
+        """
+        Ask the running search to stop (safe to call from another thread).
+        """
+        self.stop_event.set()
+
+    def clearStop(self):
+        """
+        Take back a stop() that no search has seen yet, and clear a stop_event given to the constructor.
+        """
+        self.stop_event.clear()
+
+    def reset(self):
+        """
+        Forget everything learned in earlier searches: transposition table, killers and history (new game, benchmark).
+        """
+        self.transposition_table.clear()
+        self.clearMoveOrdering()
+        for history in self.history_scores:
+            history[:] = [0] * 4096
+
+    def close(self):
+        """
+        Shut down the process pool kept by root split searches. A later root split search starts a new one.
+        """
+        if self.root_split_pool is not None:
+            self.root_split_pool.shutdown()
+            self.root_split_pool = None
+            self.root_split_workers = 0
+
+    def iterativeDeepening(self, game_state, valid_moves, time_limit, nodes=None, max_search_depth=None,
+                           first_depth=1, reproducible=False, root_pool=None):
+        """
+        Search depth first_depth, first_depth + 1, ... and return (best move, score, depth) of the last completed
+        depth. root_pool: process pool of rootSplitSearch that searches the root moves.
+        """
+        self.transposition_table.newSearch()
+        self.clearMoveOrdering()
+        self.root_ply = game_state.ply
+        valid_moves.sort(key=captureScore, reverse=True)  # later depths put the previous best move first
+        start_time = time.perf_counter()
+        self.nodes_searched = 0
+        self.quiescence_nodes = 0
+        self.node_limit = nodes if nodes is not None else math.inf
+        self.search_stopped = False
+        best_move = None
+        best_score = score = 0
+        completed_depth = 0
+        turn_multiplier = 1 if game_state.white_to_move else -1
+        difficulty = DIFFICULTY_LEVELS[self.difficulty or current_difficulty]
+        if max_search_depth is None:
+            max_search_depth = difficulty['depth']
+        self.deterministic = reproducible
+        self.use_null_move = difficulty.get('null_move', False) and not reproducible
+        self.use_lmr = difficulty.get('lmr', False) and not reproducible
+        for depth in range(first_depth, max_search_depth + 1):
+            # the first depth always completes so there is a move to play
+            self.search_deadline = start_time + time_limit if depth > first_depth else None
+            self.max_depth = depth
+            if root_pool is not None:
+                time_left = self.search_deadline - time.perf_counter() if self.search_deadline is not None else None
+                score = self.rootSplitDepth(game_state, valid_moves, depth, turn_multiplier, root_pool, time_left)
+            else:
+                score = self.aspirationSearch(game_state, valid_moves, depth, score, turn_multiplier)
+            if self.search_stopped:
+                break
+            best_move = self.next_move
+            best_score = score
+            completed_depth = depth
+            if best_move is not None:
+                # the previous best move is searched first at the next depth
+                valid_moves.remove(best_move)
+                valid_moves.insert(0, best_move)
+            if score >= CHECKMATE:
+                break  # forced mate found, searching deeper won't change the move
+            if time.perf_counter() - start_time > time_limit * 0.5:
+                break  # the next depth costs several times this one and would not finish
+        if best_move is None and valid_moves:
+            # stopped during the first depth: the best root move searched so far, or the first in MVV-LVA order
+            best_move = self.next_move if self.next_move is not None else valid_moves[0]
+        return best_move, best_score, completed_depth
+
+    def principalVariation(self, game_state, best_move, length, move_ids=None):
+        """
+        The best move followed by the hash moves of the positions it leads to, at most length moves (empty when
+        there is no move). move_ids: the ids of the moves after best_move, when another process's table has them.
+        """
+        if best_move is None or length < 1:
+            return []
+        pv = [best_move]
+        game_state.makeMove(best_move)
+        if move_ids is None:
+            move_ids = self.hashMoveIds(game_state, length - 1)
+        for move_id in move_ids[:length - 1]:
+            move = next((move for move in game_state.generateValidMoves() if move.moveID == move_id), None)
+            if move is None:
+                break
+            pv.append(move)
+            game_state.makeMove(move)
+        for _ in pv:
+            game_state.undoMove()
+        return pv
+
+    def hashMoveIds(self, game_state, length):
+        """
+        Ids of the hash moves followed from game_state in the transposition table, at most length of them.
+        """
+        move_ids = []
+        while len(move_ids) < length:
+            entry = self.transposition_table.probe(game_state.zobrist_key)
+            if entry is None or not entry[3]:
+                break
+            move = next((move for move in game_state.generateValidMoves() if move.moveID == entry[3]), None)
+            if move is None:
+                break
+            move_ids.append(move.moveID)
+            game_state.makeMove(move)
+        for _ in move_ids:
+            game_state.undoMove()
+        return move_ids
+
+    def orderedMoves(self, game_state, ply, hash_move_id):
+        """
+        Legal moves in search order: the hash move, captures and promotions by MVV-LVA, the two killer moves of
+        this ply, then the other quiet moves by history score. Quiet moves are only generated when reached,
+        unless the hash move is one of them.
+        """
+        captures = game_state.getValidCaptures()
+        quiet_moves = None
+        hash_move = None
+        if hash_move_id:
+            for move in captures:
+                if move.moveID == hash_move_id:
+                    hash_move = move
+                    break
+            else:
+                quiet_moves = game_state.getValidQuietMoves()
+                for move in quiet_moves:
+                    if move.moveID == hash_move_id:
+                        hash_move = move
+                        break
+            if hash_move is not None:
+                yield hash_move
+        captures.sort(key=captureScore, reverse=True)
+        for move in captures:
+            if move is not hash_move:
+                yield move
+        if quiet_moves is None:
+            quiet_moves = game_state.getValidQuietMoves()
+        killers = self.killer_moves[ply] if ply < MAX_PLY else ()
+        history = self.history_scores[0 if game_state.white_to_move else 1]
+        quiet_moves.sort(key=lambda move: history[move.moveID], reverse=True)
+        for killer_id in killers:
+            for move in quiet_moves:
+                if move.moveID == killer_id:
+                    if move is not hash_move:
+                        yield move
+                    break
+        for move in quiet_moves:
+            if move is not hash_move and move.moveID not in killers:
+                yield move
+
+    def storeQuietCutoff(self, game_state, move, ply, depth):
+        """
+        Remember a quiet move that caused a beta cutoff as a killer of its ply and in the history table.
+        """
+        if ply < MAX_PLY:
+            killers = self.killer_moves[ply]
+            if killers[0] != move.moveID:
+                killers[1] = killers[0]
+                killers[0] = move.moveID
+        history = self.history_scores[0 if game_state.white_to_move else 1]
+        history[move.moveID] += depth * depth
+
+    def clearMoveOrdering(self):
+        """
+        Forget the killers and age the history scores before a new search.
+        """
+        for killers in self.killer_moves:
+            killers[0] = killers[1] = 0
+        for history in self.history_scores:
+            for move_id in range(4096):
+                history[move_id] >>= 1
+
+    def lazySmpSearch(self, game_state, valid_moves, threads, time_limit, nodes=None, max_search_depth=None):
+        """
+        Lazy SMP: this process and threads - 1 helper processes run the same iterative deepening on one
+        transposition table in shared memory, the helpers with odd ids one depth ahead. What one process stores
+        the others find, so together they reach a depth sooner. When this process is done the helpers are stopped,
+        and the move of the deepest completed search is played (this process's on a tie).
+        Returns (best move, score, depth, pv), the pv read from the shared table before it is closed.
+        """
+        import multiprocessing
+        from queue import Empty
+        local_table = self.transposition_table
+        shared_table = TranspositionTable.createShared(local_table.size_mb)
+        self.helper_stop_event = multiprocessing.Event()
+        result_queue = multiprocessing.Queue()
+        helpers = [multiprocessing.Process(target=lazySmpHelper,
+                                           args=(game_state, list(valid_moves), shared_table.shared_memory.name,
+                                                 shared_table.size_mb, self.difficulty or current_difficulty,
+                                                 self.use_pvs, self.use_aspiration, time_limit, nodes,
+                                                 max_search_depth, helper_id, self.helper_stop_event,
+                                                 result_queue))
+                   for helper_id in range(1, threads)]
+        for helper in helpers:
+            helper.start()
+        self.transposition_table = shared_table
+        try:
+            try:
+                best_move, best_score, depth = self.iterativeDeepening(game_state, valid_moves, time_limit, nodes,
+                                                                       max_search_depth)
+            finally:
+                self.helper_stop_event.set()
+                results = []
+                while len(results) < len(helpers):
+                    alive = any(helper.is_alive() for helper in helpers)
+                    try:
+                        results.append(result_queue.get(timeout=HELPER_POLL_INTERVAL))
+                    except Empty:
+                        if not alive:
+                            break  # a helper died without sending its result, keep the others'
+                for helper in helpers:
+                    helper.join()
+                self.helper_stop_event = None
+            self.helper_nodes = sum(result[3] for result in results)
+            moves_by_id = {move.moveID: move for move in valid_moves}
+            best_depth = depth if best_move is not None else 0
+            for move_id, helper_score, helper_depth, _ in results:
+                if move_id in moves_by_id and helper_depth > best_depth:
+                    best_move, best_score, best_depth = moves_by_id[move_id], helper_score, helper_depth
+            pv = self.principalVariation(game_state, best_move, best_depth)
+        finally:
+            self.transposition_table = local_table
+            shared_table.close(unlink=True)
+        return best_move, best_score, best_depth, pv
+
+    def rootSplitSearch(self, game_state, valid_moves, workers, time_limit, nodes=None, max_search_depth=None):
+        """
+        Reproducible parallel search: at every depth the first root move is searched here, the others are dealt
+        out round-robin to a ProcessPoolExecutor. The workers share the best score so far through a
+        multiprocessing.Value and search each move with the window (alpha - ROOT_SPLIT_EPSILON, CHECKMATE): a move
+        that ties or beats alpha gets its exact score, the others fail low. The merge keeps the highest score and
+        on ties the earliest root move, which is the move the one-process search with reproducible=True plays.
+        The pool is started by the first root split search and kept until close(). A node budget is shared out
+        between the tasks of each depth, so it may stop at another depth than the one-process search.
+        Returns (best move, score, depth, pv); the workers send the pv of the moves they searched with their scores.
+        """
+        if len(valid_moves) < 2:
+            best_move, score, depth = self.iterativeDeepening(game_state, valid_moves, time_limit, nodes,
+                                                              max_search_depth, reproducible=True)
+            return best_move, score, depth, self.principalVariation(game_state, best_move, depth)
+        pool = self.rootSplitPool(workers)
+        self.root_split_stop_event.clear()
+        self.helper_stop_event = self.root_split_stop_event
+        self.root_split_line = None
+        try:
+            best_move, score, depth = self.iterativeDeepening(game_state, valid_moves, time_limit, nodes,
+                                                              max_search_depth, reproducible=True, root_pool=pool)
+        finally:
+            self.helper_stop_event = None
+        return best_move, score, depth, self.principalVariation(game_state, best_move, depth, self.root_split_line)
+
+    def rootSplitPool(self, workers):
+        """
+        The process pool of root split searches with the given number of workers, started on first use.
+        """
+        if self.root_split_pool is not None and self.root_split_workers != workers:
+            self.close()
+        if self.root_split_pool is None:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            if self.root_split_alpha is None:
+                self.root_split_alpha = multiprocessing.Value("d", -CHECKMATE)
+                self.root_split_stop_event = multiprocessing.Event()
+            self.root_split_pool = ProcessPoolExecutor(workers, initializer=initRootSplitWorker,
+                                                       initargs=(self.root_split_alpha, self.root_split_stop_event))
+            self.root_split_workers = workers
+        return self.root_split_pool
+
+    def rootSplitDepth(self, game_state, valid_moves, depth, turn_multiplier, pool, time_left):
+        """
+        One depth of rootSplitSearch. Sets next_move (and root_split_line) and returns its score.
+        """
+        from concurrent.futures import wait
+        self.next_move = None
+        game_state.makeMove(valid_moves[0])
+        best_score = -self.findMoveNegaMaxAlphaBeta(game_state, None, depth - 1, -CHECKMATE, CHECKMATE,
+                                                    -turn_multiplier)
+        game_state.undoMove()
+        if self.search_stopped:
+            return 0
+        best_index = 0
+        best_line = None
+        self.root_split_alpha.value = best_score
+        workers = self.root_split_workers
+        tasks = [[(index, valid_moves[index].moveID) for index in range(first, len(valid_moves), workers)]
+                 for first in range(1, min(workers, len(valid_moves) - 1) + 1)]
+        node_limit = None
+        if self.node_limit != math.inf:
+            node_limit = (self.node_limit - self.nodes_searched - self.quiescence_nodes) // len(tasks)
+        record = game_state.to_bytes()
+        futures = [pool.submit(rootSplitTask, type(game_state), record, self.use_pvs, depth, moves, time_left,
+                               node_limit)
+                   for moves in tasks]
+        pending = futures
+        while pending:
+            # pass a stop signal on to the workers while they search
+            pending = wait(pending, timeout=ROOT_SPLIT_POLL_INTERVAL).not_done
+            if pending and not self.search_stopped:
+                self.checkSearchLimits()
+                if self.search_stopped:
+                    self.helper_stop_event.set()
+        for future in futures:
+            results, nodes, quiescence_nodes, stopped = future.result()
+            self.nodes_searched += nodes
+            self.quiescence_nodes += quiescence_nodes
+            self.search_stopped = self.search_stopped or stopped
+            for index, score, line in results:
+                if score > best_score or (score == best_score and index < best_index):
+                    best_score, best_index, best_line = score, index, line
+        if self.search_stopped:
+            return 0
+        self.next_move = valid_moves[best_index]
+        self.root_split_line = best_line
+        return best_score
+
+    def searchRootMoves(self, game_state, depth, moves, time_left, node_limit=None):
+        """
+        Search the root moves [(index, move id), ...] of a root split in a pool worker, within node_limit nodes.
+        Returns ([(index, exact score, ids of the pv after the move), ...], nodes, quiescence nodes, stopped).
+        """
+        self.max_depth = depth
+        self.root_ply = game_state.ply
+        self.nodes_searched = self.quiescence_nodes = 0
+        self.search_deadline = time.perf_counter() + time_left if time_left is not None else None
+        self.node_limit = node_limit if node_limit is not None else math.inf
+        self.search_stopped = False
+        self.deterministic = True
+        self.use_null_move = self.use_lmr = False
+        turn_multiplier = 1 if game_state.white_to_move else -1
+        moves_by_id = {move.moveID: move for move in game_state.getValidMoves()}
+        shared_alpha = self.root_split_alpha
+        results = []
+        for index, move_id in moves:
+            alpha = shared_alpha.value - ROOT_SPLIT_EPSILON
+            game_state.makeMove(moves_by_id[move_id])
+            score = -self.findMoveNegaMaxAlphaBeta(game_state, None, depth - 1, -CHECKMATE, -alpha,
+                                                   -turn_multiplier)
+            line = self.hashMoveIds(game_state, depth - 1) if score > alpha and not self.search_stopped else None
+            game_state.undoMove()
+            if self.search_stopped:
+                break
+            if score > alpha:
+                results.append((index, score, line))
+                with shared_alpha.get_lock():
+                    if score > shared_alpha.value:
+                        shared_alpha.value = score
+        return results, self.nodes_searched, self.quiescence_nodes, self.search_stopped
+
+    def aspirationSearch(self, game_state, valid_moves, depth, previous_score, turn_multiplier):
+        """
+        Search the root with a window around the score of the previous depth, widening it on the side that failed
+        until the score falls inside.
+        """
+        if self.use_aspiration and depth >= ASPIRATION_MIN_DEPTH and not self.deterministic:
+            window = ASPIRATION_WINDOW
+            alpha = max(previous_score - window, -CHECKMATE)
+            beta = min(previous_score + window, CHECKMATE)
+        else:
+            window = 0
+            alpha, beta = -CHECKMATE, CHECKMATE
+        while True:
+            self.next_move = None
+            score = self.findMoveNegaMaxAlphaBeta(game_state, valid_moves, depth, alpha, beta, turn_multiplier)
+            if self.search_stopped:
+                return score
+            window *= 2
+            if score <= alpha and alpha > -CHECKMATE:
+                alpha = max(previous_score - window, -CHECKMATE)
+            elif score >= beta and beta < CHECKMATE:
+                beta = min(previous_score + window, CHECKMATE)
+            else:
+                return score
+
+    def findMoveNegaMaxAlphaBeta(self, game_state, valid_moves, depth, alpha, beta, turn_multiplier,
+                                 allow_null_move=True):
+        self.nodes_searched += 1
+        nodes = self.nodes_searched + self.quiescence_nodes
+        if nodes >= self.node_limit:
+            self.search_stopped = True  # the budget is exact, only the clock is looked at every so often
+        elif nodes & (TIME_CHECK_INTERVAL - 1) == 0:
+            self.checkSearchLimits()
+        if self.search_stopped:
+            return 0  # the result is thrown away, the search keeps the last completed depth
+        max_depth = self.max_depth
+        if depth != max_depth and (game_state.halfmove_clock >= 100 or game_state.isRepetition()):
+            return STALEMATE  # a repeated position is scored as a draw straight away
+        if depth == 0:
+            return self.quiescenceSearch(game_state, alpha, beta, turn_multiplier)
+        original_alpha = alpha
+        hash_move_id = 0
+        transposition_table = self.transposition_table
+        if depth != max_depth:
+            entry = transposition_table.probe(game_state.zobrist_key)
+            if entry is not None:
+                hash_move_id = entry[3]
+            if entry is not None and entry[0] >= depth and not self.deterministic:
+                entry_bound, entry_score = entry[1], entry[2]
+                if entry_bound == TT_EXACT:
+                    return entry_score
+                if entry_bound == TT_LOWER_BOUND:
+                    alpha = max(alpha, entry_score)
+                else:
+                    beta = min(beta, entry_score)
+                if alpha >= beta:
+                    return entry_score
+        in_check = depth >= 3 and game_state.inCheck()  # only the selective techniques below need it
+        if (self.use_null_move and allow_null_move and depth >= NULL_MOVE_MIN_DEPTH and depth != max_depth and
+                not in_check and beta - alpha < 2 * NULL_WINDOW and
+                turn_multiplier * (game_state.material_score + game_state.position_score) / EVALUATION_SCALE >= beta and
+                game_state.hasNonPawnMaterial()):  # zugzwang guard: in pawn endings passing can be the best move
+            # if passing still fails high, a real move will too
+            reduction = 3 if depth >= 6 else 2
+            game_state.makeNullMove()
+            score = -self.findMoveNegaMaxAlphaBeta(game_state, None, depth - 1 - reduction, -beta,
+                                                   -beta + NULL_WINDOW, -turn_multiplier, allow_null_move=False)
+            game_state.undoNullMove()
+            if self.search_stopped:
+                return 0
+            if score >= beta:
+                return beta if score >= CHECKMATE else score  # a mate found after passing is not proven
+        ply = game_state.ply - self.root_ply
+        if valid_moves is None:
+            valid_moves = self.orderedMoves(game_state, ply, hash_move_id)
+        use_pvs = self.use_pvs
+        use_lmr = self.use_lmr
+        max_score = -CHECKMATE
+        best_move = None
+        searched = 0
+        for move in valid_moves:
+            game_state.makeMove(move)
+            reduction = 0
+            if (use_lmr and depth >= LMR_MIN_DEPTH and searched >= LMR_MIN_MOVES and not in_check and
+                    not move.is_capture and not move.is_pawn_promotion and not game_state.inCheck()):
+                # late quiet moves rarely matter, search them shallower first
+                reduction = min(LMR_REDUCTIONS[min(depth, 63)][min(searched, 63)], depth - 2)
+            if searched == 0 or (not use_pvs and reduction == 0):
+                score = -self.findMoveNegaMaxAlphaBeta(game_state, None, depth - 1, -beta, -alpha, -turn_multiplier)
+            else:
+                # the first move is expected to be the best: only prove the others can't beat alpha
+                score = -self.findMoveNegaMaxAlphaBeta(game_state, None, depth - 1 - reduction, -alpha - NULL_WINDOW,
+                                                       -alpha, -turn_multiplier)
+                if reduction and score > alpha and not self.search_stopped:
+                    score = -self.findMoveNegaMaxAlphaBeta(game_state, None, depth - 1, -alpha - NULL_WINDOW, -alpha,
+                                                           -turn_multiplier)
+                if alpha < score < beta and not self.search_stopped:
+                    score = -self.findMoveNegaMaxAlphaBeta(game_state, None, depth - 1, -beta, -alpha,
+                                                           -turn_multiplier)
+            if self.search_stopped:
+                game_state.undoMove()
+                return 0
+            searched += 1
+            if score > max_score:
+                max_score = score
+                best_move = move
+                if depth == max_depth:
+                    self.next_move = move
+            game_state.undoMove()
+            if max_score > alpha:
+                alpha = max_score
+            if alpha >= beta:
+                if not move.is_capture and not move.is_pawn_promotion:
+                    self.storeQuietCutoff(game_state, move, ply, depth)
+                break
+        if searched == 0 and not game_state.inCheck():
+            max_score = STALEMATE
+        if max_score <= original_alpha:
+            bound = TT_UPPER_BOUND
+        elif max_score >= beta:
+            bound = TT_LOWER_BOUND
+        else:
+            bound = TT_EXACT
+        transposition_table.store(game_state.zobrist_key, depth, bound, max_score,
+                                  best_move.moveID if best_move is not None else 0)
+        return max_score
+
+    def checkSearchLimits(self):
+        """
+        Stop the search once the deadline or the node budget (main and quiescence nodes together) is reached,
+        or when stop_event is set.
+        """
+        if ((self.search_deadline is not None and time.perf_counter() >= self.search_deadline) or
+                self.nodes_searched + self.quiescence_nodes >= self.node_limit or
+                self.stop_event.is_set()):
+            self.search_stopped = True
+
+    def quiescenceSearch(self, game_state, alpha, beta, turn_multiplier):
+        """
+        Search captures and promotions only until the position is quiet, so the horizon never falls in the middle
+        of an exchange. The side to move may always stand pat on the static score unless it is in check,
+        then every evasion is searched.
+        """
+        self.quiescence_nodes += 1
+        nodes = self.nodes_searched + self.quiescence_nodes
+        if nodes >= self.node_limit:
+            self.search_stopped = True
+        elif nodes & (TIME_CHECK_INTERVAL - 1) == 0:
+            self.checkSearchLimits()
+        if self.search_stopped:
+            return 0
+        moves = game_state.getValidCaptures()
+        in_check = game_state.in_check
+        if in_check:
+            moves += game_state.getValidQuietMoves()
+            if not moves:
+                return -CHECKMATE
+            stand_pat = max_score = -CHECKMATE
+        else:
+            # the centipawn totals are integers, so the score is the same in every process
+            stand_pat = max_score = (turn_multiplier * (game_state.material_score + game_state.position_score) /
+                                     EVALUATION_SCALE)
+            if stand_pat >= beta:
+                return stand_pat
+            if stand_pat > alpha:
+                alpha = stand_pat
+        moves.sort(key=captureScore, reverse=True)
+        delta_pruning = not in_check and not self.deterministic
+        for move in moves:
+            if delta_pruning:
+                # delta pruning: even winning the captured piece for free can't lift the score to alpha
+                gain = piece_score[move.piece_captured[1]] if move.is_capture else 0
+                if move.is_pawn_promotion:
+                    gain += piece_score["Q"] - piece_score["p"]
+                if stand_pat + gain + DELTA_MARGIN <= alpha:
+                    continue
+            game_state.makeMove(move)
+            score = -self.quiescenceSearch(game_state, -beta, -alpha, -turn_multiplier)
+            game_state.undoMove()
+            if self.search_stopped:
+                return 0
+            if score > max_score:
+                max_score = score
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+        return max_score
+
+
+default_searcher = None  # the searcher behind findBestMove and resetSearch, made by the first search
+
+
+def defaultSearcher():
+    """
+    default_searcher, created on first use so that importing the module allocates no transposition table.
+    """
+    global default_searcher
+    if default_searcher is None:
+        default_searcher = Searcher()
+    return default_searcher
+
+
+def findBestMove(game_state, valid_moves, return_queue, time_limit=None, nodes=None, max_search_depth=None,
+                 threads=None, root_split_workers=None, reproducible=False, stop_event=None, remaining=None,
+                 increment=0.0, moves_to_go=None):
+    """
+    Search with default_searcher (see Searcher.search), put the best move in return_queue and return
+    the SearchResult. Setting stop_event (a multiprocessing.Event when the search runs in another process)
+    makes the search return its best move so far.
+    """
+    result = defaultSearcher().search(game_state, valid_moves, time_limit, nodes, max_search_depth, threads,
+                                      root_split_workers, reproducible, stop_event, remaining, increment,
+                                      moves_to_go)
+    return_queue.put(result.move)
+    return result
+
+
+def resetSearch():
+    """
+    Forget everything default_searcher learned in earlier searches (new game, benchmark).
+    """
+    if default_searcher is not None:
+        default_searcher.reset()
+
+
+def lazySmpHelper(game_state, valid_moves, table_name, table_size_mb, difficulty, use_pvs, use_aspiration,
+                  time_limit, nodes, max_search_depth, helper_id, event, result_queue):
+    """
+    Helper process of Searcher.lazySmpSearch. Puts (move id, score, depth, nodes) in result_queue when stopped.
+    """
+    transposition_table = TranspositionTable.attachShared(table_name, table_size_mb)
+    searcher = Searcher(difficulty, transposition_table, use_pvs, use_aspiration, event)
+    best_move, score, depth = None, 0, 0
+    try:
+        best_move, score, depth = searcher.iterativeDeepening(game_state, valid_moves, time_limit, nodes,
+                                                              max_search_depth, first_depth=1 + helper_id % 2)
+    finally:
+        # the main process waits for a result from every helper that is still alive
+        result_queue.put((best_move.moveID if best_move is not None else 0, score, depth,
+                          searcher.nodes_searched + searcher.quiescence_nodes))
+        transposition_table.close()
+
+
+def initRootSplitWorker(shared_alpha, stop_event):
+    global root_split_searcher
+    root_split_searcher = Searcher(stop_event=stop_event)
+    root_split_searcher.root_split_alpha = shared_alpha
+
+
+def rootSplitTask(state_class, record, use_pvs, depth, moves, time_left, node_limit):
+    """
+    Pool task of Searcher.rootSplitDepth, see Searcher.searchRootMoves. The position comes as a to_bytes record
+    and is only rebuilt when it differs from the one of the previous task.
+    """
+    global root_split_state, root_split_record
+    if record != root_split_record or type(root_split_state) is not state_class:
+        root_split_state = state_class.from_bytes(record)
+        root_split_record = record
+    root_split_searcher.use_pvs = use_pvs
+    return root_split_searcher.searchRootMoves(root_split_state, depth, moves, time_left, node_limit)
+
+
 def findRandomMove(valid_moves):
     """
     Picks and returns a random valid move.
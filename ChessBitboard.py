@@ -0,0 +1,561 @@
+"""
+Bitboard backend cho GameState.
+Vị trí được lưu bằng 12 bitboard 64-bit (mỗi loại quân một số nguyên) cùng các mask occupancy.
+Bit thứ i ứng với ô (i // 8, i % 8), cùng quy ước hàng/cột với bàn cờ 8x8 của ChessEngine
+(hàng 0 là hàng 8 của quân đen).
+"""
+from ChessEngine import GameState, Move
+
+PIECES = ("wp", "wN", "wB", "wR", "wQ", "wK", "bp", "bN", "bB", "bR", "bQ", "bK")
+PIECE_INDEX = {piece: index for index, piece in enumerate(PIECES)}
+WHITE, BLACK = 0, 1
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(6)
+
+FULL_BOARD = (1 << 64) - 1
+FILE_A = sum(1 << (row * 8) for row in range(8))
+FILE_H = FILE_A << 7
+SQUARES = tuple((square // 8, square % 8) for square in range(64))
+
+
+def _buildStepTable(steps):
+    """
+    For every square, the mask of squares reached by a single step in each of the given directions.
+    """
+    table = []
+    for square in range(64):
+        row, col = SQUARES[square]
+        mask = 0
+        for d_row, d_col in steps:
+            end_row = row + d_row
+            end_col = col + d_col
+            if 0 <= end_row <= 7 and 0 <= end_col <= 7:
+                mask |= 1 << (end_row * 8 + end_col)
+        table.append(mask)
+    return table
+
+
+def _buildRayTable(d_row, d_col):
+    """
+    For every square, the mask of squares along one direction up to the edge of the board.
+    """
+    table = []
+    for square in range(64):
+        row, col = SQUARES[square]
+        mask = 0
+        for i in range(1, 8):
+            end_row = row + d_row * i
+            end_col = col + d_col * i
+            if not (0 <= end_row <= 7 and 0 <= end_col <= 7):
+                break
+            mask |= 1 << (end_row * 8 + end_col)
+        table.append(mask)
+    return table
+
+
+KNIGHT_ATTACKS = _buildStepTable(((-2, -1), (-2, 1), (-1, 2), (1, 2), (2, -1), (2, 1), (-1, -2), (1, -2)))
+KING_ATTACKS = _buildStepTable(((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)))
+# squares attacked by a pawn of the given color standing on the square
+PAWN_ATTACKS = (_buildStepTable(((-1, -1), (-1, 1))), _buildStepTable(((1, -1), (1, 1))))
+
+# rays that go towards higher square indexes: the nearest blocker is the lowest set bit
+RAY_SOUTH = _buildRayTable(1, 0)
+RAY_EAST = _buildRayTable(0, 1)
+RAY_SOUTH_WEST = _buildRayTable(1, -1)
+RAY_SOUTH_EAST = _buildRayTable(1, 1)
+# rays that go towards lower square indexes: the nearest blocker is the highest set bit
+RAY_NORTH = _buildRayTable(-1, 0)
+RAY_WEST = _buildRayTable(0, -1)
+RAY_NORTH_WEST = _buildRayTable(-1, -1)
+RAY_NORTH_EAST = _buildRayTable(-1, 1)
+
+
+def _buildBetweenTable():
+    """
+    BETWEEN[a][b] holds the squares strictly between a and b if they share a line, otherwise 0.
+    """
+    table = [[0] * 64 for _ in range(64)]
+    for rays in (RAY_SOUTH, RAY_EAST, RAY_SOUTH_WEST, RAY_SOUTH_EAST,
+                 RAY_NORTH, RAY_WEST, RAY_NORTH_WEST, RAY_NORTH_EAST):
+        for start in range(64):
+            ray = rays[start]
+            while ray:
+                end_bit = ray & -ray
+                end = end_bit.bit_length() - 1
+                table[start][end] = rays[start] & ~rays[end] & ~end_bit
+                ray ^= end_bit
+    return table
+
+
+BETWEEN = _buildBetweenTable()
+
+
+def rookAttacks(square, occupied):
+    """
+    Squares attacked by a rook on square, stopping at (and including) the first blocker on each ray.
+    """
+    attacks = 0
+    ray = RAY_SOUTH[square]
+    blockers = ray & occupied
+    if blockers:
+        ray ^= RAY_SOUTH[(blockers & -blockers).bit_length() - 1]
+    attacks |= ray
+    ray = RAY_EAST[square]
+    blockers = ray & occupied
+    if blockers:
+        ray ^= RAY_EAST[(blockers & -blockers).bit_length() - 1]
+    attacks |= ray
+    ray = RAY_NORTH[square]
+    blockers = ray & occupied
+    if blockers:
+        ray ^= RAY_NORTH[blockers.bit_length() - 1]
+    attacks |= ray
+    ray = RAY_WEST[square]
+    blockers = ray & occupied
+    if blockers:
+        ray ^= RAY_WEST[blockers.bit_length() - 1]
+    return attacks | ray
+
+
+def bishopAttacks(square, occupied):
+    """
+    Squares attacked by a bishop on square, stopping at (and including) the first blocker on each ray.
+    """
+    attacks = 0
+    ray = RAY_SOUTH_WEST[square]
+    blockers = ray & occupied
+    if blockers:
+        ray ^= RAY_SOUTH_WEST[(blockers & -blockers).bit_length() - 1]
+    attacks |= ray
+    ray = RAY_SOUTH_EAST[square]
+    blockers = ray & occupied
+    if blockers:
+        ray ^= RAY_SOUTH_EAST[(blockers & -blockers).bit_length() - 1]
+    attacks |= ray
+    ray = RAY_NORTH_WEST[square]
+    blockers = ray & occupied
+    if blockers:
+        ray ^= RAY_NORTH_WEST[blockers.bit_length() - 1]
+    attacks |= ray
+    ray = RAY_NORTH_EAST[square]
+    blockers = ray & occupied
+    if blockers:
+        ray ^= RAY_NORTH_EAST[blockers.bit_length() - 1]
+    return attacks | ray
+
+
+class BitboardGameState(GameState):
+    """
+    GameState whose move generation runs on bitboards.
+    The 8x8 board is still kept in sync so the GUI and Move objects can read it as before.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.loadBitboards()
+        self.move_masks = None  # last result of legalMoveMasks
+        self.move_masks_key = None  # zobrist key of the position move_masks was computed for
+
+    def loadBitboards(self):
+        """
+        Rebuild all bitboards from self.board.
+        """
+        self.bitboards = [0] * 12
+        for row in range(8):
+            for col in range(8):
+                piece = self.board[row][col]
+                if piece != "--":
+                    self.bitboards[PIECE_INDEX[piece]] |= 1 << (row * 8 + col)
+        self.occupancy = [0, 0]
+        for piece_type in range(6):
+            self.occupancy[WHITE] |= self.bitboards[piece_type]
+            self.occupancy[BLACK] |= self.bitboards[6 + piece_type]
+        self.occupied = self.occupancy[WHITE] | self.occupancy[BLACK]
+
+    def loadDerivedState(self):
+        super().loadDerivedState()
+        self.move_masks_key = None
+        self.loadBitboards()
+
+    def makeMove(self, move):
+        super().makeMove(move)
+        self.toggleMove(move)
+
+    def undoMove(self):
+        if len(self.move_log) != 0:
+            move = self.move_log[-1]
+            super().undoMove()
+            self.toggleMove(move)
+
+    def toggleMove(self, move):
+        """
+        XOR the move into the bitboards. Applying it a second time takes it back.
+        """
+        bitboards = self.bitboards
+        start = move.start_row * 8 + move.start_col
+        end = move.end_row * 8 + move.end_col
+        moved = PIECE_INDEX[move.piece_moved]
+        color = WHITE if moved < 6 else BLACK
+        from_to = (1 << start) | (1 << end)
+        if move.is_pawn_promotion:
+            bitboards[moved] ^= 1 << start
+            bitboards[moved + QUEEN] ^= 1 << end
+        else:
+            bitboards[moved] ^= from_to
+        self.occupancy[color] ^= from_to
+        if move.piece_captured != "--":
+            captured_square = move.start_row * 8 + move.end_col if move.is_enpassant_move else end
+            bitboards[PIECE_INDEX[move.piece_captured]] ^= 1 << captured_square
+            self.occupancy[color ^ 1] ^= 1 << captured_square
+        if move.is_castle_move:
+            if move.end_col - move.start_col == 2:  # king-side
+                rook_from_to = (1 << (end + 1)) | (1 << (end - 1))
+            else:  # queen-side
+                rook_from_to = (1 << (end - 2)) | (1 << (end + 1))
+            bitboards[moved - KING + ROOK] ^= rook_from_to
+            self.occupancy[color] ^= rook_from_to
+        self.occupied = self.occupancy[WHITE] | self.occupancy[BLACK]
+
+    def attackersTo(self, square, color, occupied):
+        """
+        Mask of the pieces of the given color that attack square, with occupied as the blockers.
+        """
+        bitboards = self.bitboards
+        base = 0 if color == WHITE else 6
+        rooks_queens = bitboards[base + ROOK] | bitboards[base + QUEEN]
+        bishops_queens = bitboards[base + BISHOP] | bitboards[base + QUEEN]
+        return ((KNIGHT_ATTACKS[square] & bitboards[base + KNIGHT]) |
+                (KING_ATTACKS[square] & bitboards[base + KING]) |
+                (PAWN_ATTACKS[color ^ 1][square] & bitboards[base + PAWN]) |
+                (rookAttacks(square, occupied) & rooks_queens) |
+                (bishopAttacks(square, occupied) & bishops_queens))
+
+    def attackMap(self, color, occupied):
+        """
+        Mask of every square attacked by the pieces of the given color.
+        """
+        bitboards = self.bitboards
+        base = 0 if color == WHITE else 6
+        pawns = bitboards[base + PAWN]
+        if color == WHITE:
+            attacks = ((pawns & ~FILE_A) >> 9) | ((pawns & ~FILE_H) >> 7)
+        else:
+            attacks = (((pawns & ~FILE_A) << 7) | ((pawns & ~FILE_H) << 9)) & FULL_BOARD
+        pieces = bitboards[base + KNIGHT]
+        while pieces:
+            bit = pieces & -pieces
+            attacks |= KNIGHT_ATTACKS[bit.bit_length() - 1]
+            pieces ^= bit
+        pieces = bitboards[base + BISHOP] | bitboards[base + QUEEN]
+        while pieces:
+            bit = pieces & -pieces
+            attacks |= bishopAttacks(bit.bit_length() - 1, occupied)
+            pieces ^= bit
+        pieces = bitboards[base + ROOK] | bitboards[base + QUEEN]
+        while pieces:
+            bit = pieces & -pieces
+            attacks |= rookAttacks(bit.bit_length() - 1, occupied)
+            pieces ^= bit
+        king = bitboards[base + KING]
+        if king:
+            attacks |= KING_ATTACKS[king.bit_length() - 1]
+        return attacks
+
+    def squareUnderAttack(self, row, col):
+        """
+        Determine if enemy can attack the square row col
+        """
+        enemy = BLACK if self.white_to_move else WHITE
+        return self.attackersTo(row * 8 + col, enemy, self.occupied) != 0
+
+    def getValidMoves(self):
+        """
+        All legal moves, generated from check and pin masks instead of trying every move.
+        """
+        moves = []
+        self.addLegalMoves(self.legalMoveMasks(), None, moves)
+        if len(moves) == 0:
+            self.checkmate = self.in_check
+            self.stalemate = not self.in_check
+        else:
+            self.checkmate = False
+            self.stalemate = self.isDrawByRule()
+        return moves
+
+    def generateValidMoves(self):
+        """
+        Legal moves produced in two stages, captures and promotions first, then quiet moves.
+        The quiet moves are only generated if the caller asks for more after the first stage.
+        """
+        masks = self.legalMoveMasks()
+        moves = []
+        self.addLegalMoves(masks, True, moves)
+        yield from moves
+        moves = []
+        self.addLegalMoves(masks, False, moves)
+        yield from moves
+
+    def getValidCaptures(self):
+        """
+        Legal captures (en passant included) and promotions.
+        """
+        moves = []
+        self.addLegalMoves(self.legalMoveMasks(), True, moves)
+        return moves
+
+    def getValidQuietMoves(self):
+        """
+        Legal moves that neither capture nor promote, castling included.
+        """
+        moves = []
+        self.addLegalMoves(self.legalMoveMasks(), False, moves)
+        return moves
+
+    def hasLegalMove(self):
+        """
+        True if the side to move has at least one legal move, tested on the target masks without creating moves.
+        """
+        us, king_square, enemy_attacks, checkers, target_mask, pins = self.legalMoveMasks()
+        base = 0 if us == WHITE else 6
+        bitboards = self.bitboards
+        own = self.occupancy[us]
+        occupied = self.occupied
+        if KING_ATTACKS[king_square] & ~own & ~enemy_attacks:
+            return True
+        if not target_mask:
+            return False
+        available = ~own & target_mask
+        pieces = bitboards[base + KNIGHT]
+        while pieces:
+            bit = pieces & -pieces
+            square = bit.bit_length() - 1
+            if square not in pins and KNIGHT_ATTACKS[square] & available:
+                return True
+            pieces ^= bit
+        pieces = bitboards[base + BISHOP] | bitboards[base + QUEEN]
+        while pieces:
+            bit = pieces & -pieces
+            square = bit.bit_length() - 1
+            if bishopAttacks(square, occupied) & available & pins.get(square, FULL_BOARD):
+                return True
+            pieces ^= bit
+        pieces = bitboards[base + ROOK] | bitboards[base + QUEEN]
+        while pieces:
+            bit = pieces & -pieces
+            square = bit.bit_length() - 1
+            if rookAttacks(square, occupied) & available & pins.get(square, FULL_BOARD):
+                return True
+            pieces ^= bit
+        # castling is never the only legal move: the king could also step towards the rook
+        moves = []
+        self.getPawnBitboardMoves(us, king_square, target_mask, pins, None, moves)
+        return len(moves) > 0
+
+    def hasNonPawnMaterial(self):
+        base = 0 if self.white_to_move else 6
+        bitboards = self.bitboards
+        return (bitboards[base + KNIGHT] | bitboards[base + BISHOP] | bitboards[base + ROOK] |
+                bitboards[base + QUEEN]) != 0
+
+    def legalMoveMasks(self):
+        """
+        Check and pin information for the side to move, shared by every stage of the move generation:
+        (us, king_square, enemy_attacks, checkers, target_mask, pins).
+        target_mask holds the squares that answer a check (every square when not in check, none in double check),
+        pins maps the square of each pinned piece to the line it may still move on.
+        The result is kept for the position, so the stages of a staged generation compute it once.
+        """
+        if self.move_masks_key == self.zobrist_key:
+            self.in_check = self.move_masks[3] != 0
+            return self.move_masks
+        us = WHITE if self.white_to_move else BLACK
+        them = us ^ 1
+        enemy_base = 6 if us == WHITE else 0
+        bitboards = self.bitboards
+        occupied = self.occupied
+        king_bit = bitboards[(0 if us == WHITE else 6) + KING]
+        king_square = king_bit.bit_length() - 1
+
+        checkers = self.attackersTo(king_square, them, occupied)
+        self.in_check = checkers != 0
+        # the king may not step back along the line of a slider, so it is removed from the blockers
+        enemy_attacks = self.attackMap(them, occupied ^ king_bit)
+        pins = {}
+        if checkers & (checkers - 1):  # double check, king has to move
+            self.move_masks = us, king_square, enemy_attacks, checkers, 0, pins
+            self.move_masks_key = self.zobrist_key
+            return self.move_masks
+        if checkers:
+            # capture the checking piece or block the line between it and the king
+            target_mask = checkers | BETWEEN[king_square][checkers.bit_length() - 1]
+        else:
+            target_mask = FULL_BOARD
+
+        # pinned pieces may only move along the line between the king and the pinning piece
+        own = self.occupancy[us]
+        enemy = self.occupancy[them]
+        enemy_rooks_queens = bitboards[enemy_base + ROOK] | bitboards[enemy_base + QUEEN]
+        enemy_bishops_queens = bitboards[enemy_base + BISHOP] | bitboards[enemy_base + QUEEN]
+        snipers = ((rookAttacks(king_square, enemy) & enemy_rooks_queens) |
+                   (bishopAttacks(king_square, enemy) & enemy_bishops_queens))
+        while snipers:
+            bit = snipers & -snipers
+            sniper_square = bit.bit_length() - 1
+            blockers = BETWEEN[king_square][sniper_square] & occupied
+            if blockers and not blockers & (blockers - 1) and blockers & own:
+                pins[blockers.bit_length() - 1] = BETWEEN[king_square][sniper_square] | bit
+            snipers ^= bit
+        self.move_masks = us, king_square, enemy_attacks, checkers, target_mask, pins
+        self.move_masks_key = self.zobrist_key
+        return self.move_masks
+
+    def addLegalMoves(self, masks, captures, moves):
+        """
+        Add the legal captures and promotions (captures=True), the legal quiet moves (captures=False)
+        or all legal moves in one pass (captures=None).
+        """
+        us, king_square, enemy_attacks, checkers, target_mask, pins = masks
+        base = 0 if us == WHITE else 6
+        bitboards = self.bitboards
+        board = self.board
+        # squares a move may end on in this stage
+        if captures is None:
+            stage_mask = ~self.occupancy[us] & FULL_BOARD
+        elif captures:
+            stage_mask = self.occupancy[us ^ 1]
+        else:
+            stage_mask = ~self.occupied & FULL_BOARD
+
+        king_targets = KING_ATTACKS[king_square] & stage_mask & ~enemy_attacks
+        king_start = SQUARES[king_square]
+        while king_targets:
+            bit = king_targets & -king_targets
+            moves.append(Move(king_start, SQUARES[bit.bit_length() - 1], board))
+            king_targets ^= bit
+        if not target_mask:
+            return
+
+        occupied = self.occupied
+        available = stage_mask & target_mask
+        pieces = bitboards[base + KNIGHT]
+        while pieces:
+            bit = pieces & -pieces
+            square = bit.bit_length() - 1
+            if square not in pins:  # a pinned knight can never move
+                self.addMoves(square, KNIGHT_ATTACKS[square] & available, moves)
+            pieces ^= bit
+        pieces = bitboards[base + BISHOP] | bitboards[base + QUEEN]
+        while pieces:
+            bit = pieces & -pieces
+            square = bit.bit_length() - 1
+            targets = bishopAttacks(square, occupied) & available
+            if square in pins:
+                targets &= pins[square]
+            self.addMoves(square, targets, moves)
+            pieces ^= bit
+        pieces = bitboards[base + ROOK] | bitboards[base + QUEEN]
+        while pieces:
+            bit = pieces & -pieces
+            square = bit.bit_length() - 1
+            targets = rookAttacks(square, occupied) & available
+            if square in pins:
+                targets &= pins[square]
+            self.addMoves(square, targets, moves)
+            pieces ^= bit
+
+        self.getPawnBitboardMoves(us, king_square, target_mask, pins, captures, moves)
+        if not captures and not checkers:
+            self.getCastleBitboardMoves(us, king_square, enemy_attacks, moves)
+
+    def addMoves(self, square, targets, moves):
+        start = SQUARES[square]
+        board = self.board
+        while targets:
+            bit = targets & -targets
+            moves.append(Move(start, SQUARES[bit.bit_length() - 1], board))
+            targets ^= bit
+
+    def getPawnBitboardMoves(self, us, king_square, target_mask, pins, captures, moves):
+        """
+        Pawn captures, en passant and promotions when captures is True, the other pushes when it is False,
+        everything when it is None.
+        """
+        bitboards = self.bitboards
+        board = self.board
+        occupied = self.occupied
+        enemy = self.occupancy[us ^ 1]
+        if us == WHITE:
+            forward = -8
+            start_rank_low, start_rank_high = 48, 55
+            promotion_rank_low, promotion_rank_high = 8, 15
+        else:
+            forward = 8
+            start_rank_low, start_rank_high = 8, 15
+            promotion_rank_low, promotion_rank_high = 48, 55
+        if self.enpassant_possible:
+            enpassant_square = self.enpassant_possible[0] * 8 + self.enpassant_possible[1]
+        else:
+            enpassant_square = -1
+        pawns = bitboards[PAWN if us == WHITE else 6 + PAWN]
+        while pawns:
+            bit = pawns & -pawns
+            square = bit.bit_length() - 1
+            pawns ^= bit
+            allowed = target_mask & pins.get(square, FULL_BOARD)
+            start = SQUARES[square]
+            one_step = square + forward
+            promotes = promotion_rank_low <= square <= promotion_rank_high
+            if not (occupied >> one_step) & 1:
+                if (captures is None or promotes == captures) and (allowed >> one_step) & 1:
+                    moves.append(Move(start, SQUARES[one_step], board))
+                if not captures and start_rank_low <= square <= start_rank_high:
+                    two_steps = one_step + forward
+                    if not (occupied >> two_steps) & 1 and (allowed >> two_steps) & 1:
+                        moves.append(Move(start, SQUARES[two_steps], board))
+            if captures is False:
+                continue
+            attacks = PAWN_ATTACKS[us][square]
+            self.addMoves(square, attacks & enemy & allowed, moves)
+            if enpassant_square >= 0 and (attacks >> enpassant_square) & 1:
+                if self.isLegalEnpassant(us, king_square, square, enpassant_square):
+                    moves.append(Move(start, SQUARES[enpassant_square], board, is_enpassant_move=True))
+
+    def isLegalEnpassant(self, us, king_square, from_square, to_square):
+        """
+        En passant removes two pieces from the same rank, so it is verified by looking at the position after it.
+        """
+        them = us ^ 1
+        enemy_base = 0 if them == WHITE else 6
+        captured_bit = 1 << (to_square - 8 if us == BLACK else to_square + 8)
+        occupied = (self.occupied ^ (1 << from_square) ^ captured_bit) | (1 << to_square)
+        bitboards = self.bitboards
+        rooks_queens = bitboards[enemy_base + ROOK] | bitboards[enemy_base + QUEEN]
+        bishops_queens = bitboards[enemy_base + BISHOP] | bitboards[enemy_base + QUEEN]
+        return not ((rookAttacks(king_square, occupied) & rooks_queens) or
+                    (bishopAttacks(king_square, occupied) & bishops_queens) or
+                    (KNIGHT_ATTACKS[king_square] & bitboards[enemy_base + KNIGHT]) or
+                    (PAWN_ATTACKS[us][king_square] & bitboards[enemy_base + PAWN] & ~captured_bit))
+
+    def getCastleBitboardMoves(self, us, king_square, enemy_attacks, moves):
+        rights = self.castling_rights
+        if us == WHITE:
+            kingside, queenside, home, rooks = rights & 1, rights & 4, 60, self.bitboards[ROOK]
+        else:
+            kingside, queenside, home, rooks = rights & 2, rights & 8, 4, self.bitboards[6 + ROOK]
+        if king_square != home:
+            return
+        occupied = self.occupied
+        start = SQUARES[home]
+        if kingside and (rooks >> (home + 3)) & 1:
+            path = (1 << (home + 1)) | (1 << (home + 2))
+            if not path & occupied and not path & enemy_attacks:
+                moves.append(Move(start, SQUARES[home + 2], self.board, is_castle_move=True))
+        if queenside and (rooks >> (home - 4)) & 1:
+            path = (1 << (home - 1)) | (1 << (home - 2))
+            if not (path | (1 << (home - 3))) & occupied and not path & enemy_attacks:
+                moves.append(Move(start, SQUARES[home - 2], self.board, is_castle_move=True))
+
+
+BACKENDS = {  # game state classes by name, for the --backend options and ChessWorker
+    "mailbox": GameState,
+    "bitboard": BitboardGameState,
+}
@@ -1,4 +1,155 @@
+import random
+import struct
 
+# ===== ZOBRIST HASHING =====
+# Seed cố định để mọi tiến trình (GUI, AI) sinh ra cùng một bộ khóa
+_zobrist_random = random.Random(20241)
+ZOBRIST_PIECES = {color + piece: [_zobrist_random.getrandbits(64) for _ in range(64)]
+                  for color in "wb" for piece in "pNBRQK"}
+ZOBRIST_BLACK_TO_MOVE = _zobrist_random.getrandbits(64)
+ZOBRIST_CASTLING = [_zobrist_random.getrandbits(64) for _ in range(16)]  # one key per combination of rights
+ZOBRIST_ENPASSANT = [_zobrist_random.getrandbits(64) for _ in range(8)]  # one key per file
+
+# ===== BẢNG NƯỚC ĐI TÍNH SẴN CHO TỪNG Ô =====
+# up, left, down, right, then the diagonals up/left up/right down/left down/right
+DIRECTIONS = ((-1, 0), (0, -1), (1, 0), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1))
+OPPOSITE_DIRECTIONS = tuple((-d_row, -d_col) for d_row, d_col in DIRECTIONS)
+KNIGHT_OFFSETS = ((-2, -1), (-2, 1), (-1, 2), (1, 2), (2, -1), (2, 1), (-1, -2), (1, -2))
+
+
+def _buildTargets(row, col, offsets):
+    return tuple((row + d_row, col + d_col) for d_row, d_col in offsets
+                 if 0 <= row + d_row <= 7 and 0 <= col + d_col <= 7)
+
+
+def _buildRays(row, col):
+    rays = []
+    for d_row, d_col in DIRECTIONS:
+        rays.append(tuple((row + d_row * i, col + d_col * i) for i in range(1, 8)
+                          if 0 <= row + d_row * i <= 7 and 0 <= col + d_col * i <= 7))
+    return tuple(rays)
+
+
+# TABLE[row][col] -> squares reachable from (row, col), already clipped to the board
+KNIGHT_TARGETS = tuple(tuple(_buildTargets(row, col, KNIGHT_OFFSETS) for col in range(8)) for row in range(8))
+KING_TARGETS = tuple(tuple(_buildTargets(row, col, DIRECTIONS) for col in range(8)) for row in range(8))
+# RAYS[row][col][j] -> squares along DIRECTIONS[j], nearest first
+RAYS = tuple(tuple(_buildRays(row, col) for col in range(8)) for row in range(8))
+
+# ===== BẢNG ĐIỂM ĐÁNH GIÁ =====
+piece_score = {"K": 0, "Q": 9, "R": 5, "B": 3, "N": 3, "p": 1}
+#Đánh giá mức độ quan trọng của từng quân cờ (VD: 0 là không thể để mất,Q là quan trọng nhất và chỉ mang tính tương đối)
+
+knight_scores = [[0.0, 0.1, 0.2, 0.2, 0.2, 0.2, 0.1, 0.0],
+                 [0.1, 0.3, 0.5, 0.5, 0.5, 0.5, 0.3, 0.1],
+                 [0.2, 0.5, 0.6, 0.65, 0.65, 0.6, 0.5, 0.2],
+                 [0.2, 0.55, 0.65, 0.7, 0.7, 0.65, 0.55, 0.2],
+                 [0.2, 0.5, 0.65, 0.7, 0.7, 0.65, 0.5, 0.2],
+                 [0.2, 0.55, 0.6, 0.65, 0.65, 0.6, 0.55, 0.2],
+                 [0.1, 0.3, 0.5, 0.55, 0.55, 0.5, 0.3, 0.1],
+                 [0.0, 0.1, 0.2, 0.2, 0.2, 0.2, 0.1, 0.0]]
+
+bishop_scores = [[0.0, 0.2, 0.2, 0.2, 0.2, 0.2, 0.2, 0.0],
+                 [0.2, 0.4, 0.4, 0.4, 0.4, 0.4, 0.4, 0.2],
+                 [0.2, 0.4, 0.5, 0.6, 0.6, 0.5, 0.4, 0.2],
+                 [0.2, 0.5, 0.5, 0.6, 0.6, 0.5, 0.5, 0.2],
+                 [0.2, 0.4, 0.6, 0.6, 0.6, 0.6, 0.4, 0.2],
+                 [0.2, 0.6, 0.6, 0.6, 0.6, 0.6, 0.6, 0.2],
+                 [0.2, 0.5, 0.4, 0.4, 0.4, 0.4, 0.5, 0.2],
+                 [0.0, 0.2, 0.2, 0.2, 0.2, 0.2, 0.2, 0.0]]
+
+rook_scores = [[0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25],
+               [0.5, 0.75, 0.75, 0.75, 0.75, 0.75, 0.75, 0.5],
+               [0.0, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.0],
+               [0.0, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.0],
+               [0.0, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.0],
+               [0.0, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.0],
+               [0.0, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.0],
+               [0.25, 0.25, 0.25, 0.5, 0.5, 0.25, 0.25, 0.25]]
+
+queen_scores = [[0.0, 0.2, 0.2, 0.3, 0.3, 0.2, 0.2, 0.0],
+                [0.2, 0.4, 0.4, 0.4, 0.4, 0.4, 0.4, 0.2],
+                [0.2, 0.4, 0.5, 0.5, 0.5, 0.5, 0.4, 0.2],
+                [0.3, 0.4, 0.5, 0.5, 0.5, 0.5, 0.4, 0.3],
+                [0.4, 0.4, 0.5, 0.5, 0.5, 0.5, 0.4, 0.3],
+                [0.2, 0.5, 0.5, 0.5, 0.5, 0.5, 0.4, 0.2],
+                [0.2, 0.4, 0.5, 0.4, 0.4, 0.4, 0.4, 0.2],
+                [0.0, 0.2, 0.2, 0.3, 0.3, 0.2, 0.2, 0.0]]
+
+pawn_scores = [[0.8, 0.8, 0.8, 0.8, 0.8, 0.8, 0.8, 0.8],
+               [0.7, 0.7, 0.7, 0.7, 0.7, 0.7, 0.7, 0.7],
+               [0.3, 0.3, 0.4, 0.5, 0.5, 0.4, 0.3, 0.3],
+               [0.25, 0.25, 0.3, 0.45, 0.45, 0.3, 0.25, 0.25],
+               [0.2, 0.2, 0.2, 0.4, 0.4, 0.2, 0.2, 0.2],
+               [0.25, 0.15, 0.1, 0.2, 0.2, 0.1, 0.15, 0.25],
+               [0.25, 0.3, 0.3, 0.0, 0.0, 0.3, 0.3, 0.25],
+               [0.2, 0.2, 0.2, 0.2, 0.2, 0.2, 0.2, 0.2]]
+
+piece_position_scores = {"wN": knight_scores,
+                         "bN": knight_scores[::-1],
+                         "wB": bishop_scores,
+                         "bB": bishop_scores[::-1],
+                         "wQ": queen_scores,
+                         "bQ": queen_scores[::-1],
+                         "wR": rook_scores,
+                         "bR": rook_scores[::-1],
+                         "wp": pawn_scores,
+                         "bp": pawn_scores[::-1]}
+
+# signed from white's point of view and indexed by square, for the running totals kept by GameState.
+# The totals are whole centipawns: integer sums are the same whether updated move by move or computed
+# from scratch (float sums are not), so every process scores a position exactly alike.
+EVALUATION_SCALE = 100  # total / EVALUATION_SCALE is the score in pawns
+MATERIAL_SCORES = {color + piece: value * EVALUATION_SCALE if color == "w" else -value * EVALUATION_SCALE
+                   for color in "wb" for piece, value in piece_score.items()}
+POSITION_SCORES = {piece: ([0] * 64 if piece[1] == "K" else
+                           [(1 if piece[0] == "w" else -1) *
+                            round(piece_position_scores[piece][square // 8][square % 8] * EVALUATION_SCALE)
+                            for square in range(64)])
+                   for piece in MATERIAL_SCORES}
+
+# ===== QUYỀN NHẬP THÀNH & UNDO STACK =====
+# castling rights packed into 4 bits, same order as ZOBRIST_CASTLING / CastleRights.index()
+WHITE_KINGSIDE, BLACK_KINGSIDE, WHITE_QUEENSIDE, BLACK_QUEENSIDE = 1, 2, 4, 8
+ALL_CASTLING_RIGHTS = 15
+# rights kept when a piece moves from or to the square (king and rook home squares)
+CASTLING_RIGHTS_MASK = [ALL_CASTLING_RIGHTS] * 64
+CASTLING_RIGHTS_MASK[7 * 8 + 4] = ALL_CASTLING_RIGHTS & ~(WHITE_KINGSIDE | WHITE_QUEENSIDE)  # e1
+CASTLING_RIGHTS_MASK[7 * 8 + 7] = ALL_CASTLING_RIGHTS & ~WHITE_KINGSIDE  # h1
+CASTLING_RIGHTS_MASK[7 * 8 + 0] = ALL_CASTLING_RIGHTS & ~WHITE_QUEENSIDE  # a1
+CASTLING_RIGHTS_MASK[0 * 8 + 4] = ALL_CASTLING_RIGHTS & ~(BLACK_KINGSIDE | BLACK_QUEENSIDE)  # e8
+CASTLING_RIGHTS_MASK[0 * 8 + 7] = ALL_CASTLING_RIGHTS & ~BLACK_KINGSIDE  # h8
+CASTLING_RIGHTS_MASK[0 * 8 + 0] = ALL_CASTLING_RIGHTS & ~BLACK_QUEENSIDE  # a8
+# pieces a right needs on their home squares: (right, ((row, col, piece), ...))
+CASTLING_PIECES = ((WHITE_KINGSIDE, ((7, 4, "wK"), (7, 7, "wR"))), (WHITE_QUEENSIDE, ((7, 4, "wK"), (7, 0, "wR"))),
+                   (BLACK_KINGSIDE, ((0, 4, "bK"), (0, 7, "bR"))), (BLACK_QUEENSIDE, ((0, 4, "bK"), (0, 0, "bR"))))
+# en passant target square by [white_to_move][file]: black just pushed past row 2, white past row 5
+ENPASSANT_SQUARES = (tuple((5, col) for col in range(8)), tuple((2, col) for col in range(8)))
+UNDO_STACK_SIZE = 1024  # plies; the stack doubles if a game ever gets longer
+
+# ===== KẾT QUẢ VÁN CỜ (getTerminalStatus) =====
+STATUS_ONGOING = "ongoing"
+STATUS_CHECKMATE = "checkmate"
+STATUS_STALEMATE = "stalemate"
+STATUS_FIFTY_MOVE_DRAW = "fifty_move_draw"
+STATUS_REPETITION_DRAW = "repetition_draw"
+
+# ===== FEN / EPD =====
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+FEN_CASTLING = (("K", WHITE_KINGSIDE), ("Q", WHITE_QUEENSIDE), ("k", BLACK_KINGSIDE), ("q", BLACK_QUEENSIDE))
+
+# ===== MÃ HÓA NHỊ PHÂN (to_bytes / from_bytes) =====
+# fixed-size record: 64 squares of 4 bits, side to move | castling << 1, en passant file (-1 for none),
+# halfmove clock, fullmove number, number of history keys, then the Zobrist keys of the previous plies
+# (latest first, zero padded): enough to detect repetitions up to the fifty-move rule
+HISTORY_PLIES = 100
+POSITION_RECORD = struct.Struct(f"<32sBbHHB{HISTORY_PLIES}Q")
+POSITION_BYTES = POSITION_RECORD.size
+PIECE_CODES = ("--", "wp", "wN", "wB", "wR", "wQ", "wK", "bp", "bN", "bB", "bR", "bQ", "bK")
+PIECE_CODE = {piece: code for code, piece in enumerate(PIECE_CODES)}
+# the two squares packed in a byte, low nibble first
+BYTE_PIECES = [(PIECE_CODES[byte & 15] if byte & 15 < 13 else None, PIECE_CODES[byte >> 4] if byte >> 4 < 13 else None)
+               for byte in range(256)]
 
 
 class GameState:
@@ -25,17 +176,354 @@ class GameState:
         self.pins = []
         self.checks = []
         self.enpassant_possible = ()  # coordinates for the square where en-passant capture is possible
-        self.enpassant_possible_log = [self.enpassant_possible]
-        self.current_castling_rights = CastleRights(True, True, True, True)
-        self.castle_rights_log = [CastleRights(self.current_castling_rights.wks, self.current_castling_rights.bks,
-                                               self.current_castling_rights.wqs, self.current_castling_rights.bqs)]
+        self.castling_rights = ALL_CASTLING_RIGHTS  # WHITE_KINGSIDE | BLACK_KINGSIDE | ...
+        self.start_fullmove = 1  # move number of the position move_log starts from
+        self.halfmove_clock = 0  # plies since the last capture or pawn move, for the fifty-move rule
+        self.resetHistory()
+        self.attack_map = 0  # squares attacked by the side not to move, see getEnemyAttackMap
+        self.attack_map_key = None  # zobrist key of the position attack_map was computed for
+        self.legal_moves = []  # see getCachedLegalMoves
+        self.legal_moves_in_check = False
+        self.legal_moves_key = None
+
+    def computeZobristKey(self):
+        """
+        Compute the Zobrist key of the position from scratch.
+        """
+        key = 0
+        for row in range(8):
+            for col in range(8):
+                piece = self.board[row][col]
+                if piece != "--":
+                    key ^= ZOBRIST_PIECES[piece][row * 8 + col]
+        if not self.white_to_move:
+            key ^= ZOBRIST_BLACK_TO_MOVE
+        key ^= ZOBRIST_CASTLING[self.castling_rights]
+        if self.enpassant_possible:
+            key ^= ZOBRIST_ENPASSANT[self.enpassant_possible[1]]
+        return key
+
+    def computeEvaluation(self):
+        """
+        Material and piece-square totals in centipawns from white's point of view, computed from scratch.
+        """
+        material = 0
+        position = 0
+        for row in range(8):
+            for col in range(8):
+                piece = self.board[row][col]
+                if piece != "--":
+                    material += MATERIAL_SCORES[piece]
+                    position += POSITION_SCORES[piece][row * 8 + col]
+        return material, position
+
+    def resetHistory(self):
+        """
+        Start a new undo stack with the current position as its only entry.
+        Each ply of the stack keeps what a move can't give back by itself: castling bits, en passant file,
+        the captured piece, halfmove clock, evaluation totals and the position key. The lists are allocated
+        once, so makeMove/undoMove only overwrite entries; a state loading a new position (from_fen, from_bytes)
+        keeps its lists, since an entry above the current ply is always written before it is read.
+        """
+        self.ply = 0
+        if getattr(self, "hash_stack", None) is None:
+            self.castling_stack = [0] * UNDO_STACK_SIZE
+            self.enpassant_stack = [-1] * UNDO_STACK_SIZE
+            self.captured_stack = ["--"] * UNDO_STACK_SIZE
+            self.halfmove_stack = [0] * UNDO_STACK_SIZE
+            self.material_stack = [0] * UNDO_STACK_SIZE
+            self.position_stack = [0] * UNDO_STACK_SIZE
+            self.hash_stack = [0] * UNDO_STACK_SIZE
+        self.zobrist_key = self.computeZobristKey()
+        self.material_score, self.position_score = self.computeEvaluation()
+        self.castling_stack[0] = self.castling_rights
+        self.enpassant_stack[0] = self.enpassant_possible[1] if self.enpassant_possible else -1
+        self.halfmove_stack[0] = self.halfmove_clock
+        self.material_stack[0] = self.material_score
+        self.position_stack[0] = self.position_score
+        self.hash_stack[0] = self.zobrist_key
+
+    def growUndoStack(self):
+        size = len(self.hash_stack)
+        self.castling_stack.extend([0] * size)
+        self.enpassant_stack.extend([-1] * size)
+        self.captured_stack.extend(["--"] * size)
+        self.halfmove_stack.extend([0] * size)
+        self.material_stack.extend([0] * size)
+        self.position_stack.extend([0] * size)
+        self.hash_stack.extend([0] * size)
+
+    @property
+    def current_castling_rights(self):
+        """
+        Castling rights as a CastleRights object, for code that reads them by name.
+        """
+        rights = self.castling_rights
+        return CastleRights(bool(rights & WHITE_KINGSIDE), bool(rights & BLACK_KINGSIDE),
+                            bool(rights & WHITE_QUEENSIDE), bool(rights & BLACK_QUEENSIDE))
+
+    @classmethod
+    def from_fen(cls, fen):
+        """
+        New game state set up from a FEN string. The halfmove clock and move number fields are optional.
+        """
+        game_state = cls()
+        game_state.loadFen(fen)
+        return game_state
+
+    @classmethod
+    def from_epd(cls, epd):
+        """
+        New game state from an EPD line, returned with its operations as a dict.
+        Operands are kept as strings: {"bm": ["Qxf7+"], "id": "WAC.001"}. Opcodes that can take several
+        operands (bm, am, pv) always map to a list, others to a single string (or None without operand).
+        """
+        fields = epd.split(None, 4)
+        if len(fields) < 4:
+            raise ValueError(f"EPD needs at least 4 fields: {epd!r}")
+        game_state = cls()
+        game_state.loadFen(" ".join(fields[:4]))
+        return game_state, parseEpdOperations(fields[4] if len(fields) == 5 else "")
+
+    def loadFen(self, fen):
+        """
+        Set up the position from a FEN string, replacing the board, side to move, castling rights,
+        en passant square and move history.
+        """
+        fields = fen.split()
+        if len(fields) < 4:
+            raise ValueError(f"FEN needs at least 4 fields: {fen!r}")
+        board = []
+        for rank in fields[0].split("/"):
+            row = []
+            for char in rank:
+                if char.isdigit():
+                    row.extend(["--"] * int(char))
+                elif char in "pnbrqkPNBRQK":
+                    color = "w" if char.isupper() else "b"
+                    row.append(color + ("p" if char in "pP" else char.upper()))
+                else:
+                    raise ValueError(f"invalid piece {char!r} in FEN: {fen!r}")
+            if len(row) != 8:
+                raise ValueError(f"rank {rank!r} does not have 8 squares: {fen!r}")
+            board.append(row)
+        if len(board) != 8:
+            raise ValueError(f"FEN board does not have 8 ranks: {fen!r}")
+        if fields[1] not in ("w", "b"):
+            raise ValueError(f"invalid side to move {fields[1]!r}: {fen!r}")
+
+        self.board = board
+        self.white_to_move = fields[1] == "w"
+        self.white_king_location = None
+        self.black_king_location = None
+        for row in range(8):
+            for col in range(8):
+                if board[row][col] == "wK":
+                    self.white_king_location = (row, col)
+                elif board[row][col] == "bK":
+                    self.black_king_location = (row, col)
+        if self.white_king_location is None or self.black_king_location is None:
+            raise ValueError(f"FEN must have one king per side: {fen!r}")
+        rights = 0
+        for char, flag in FEN_CASTLING:
+            if char in fields[2]:
+                rights |= flag
+        self.castling_rights = castlingRightsOnBoard(board, rights)
+        if fields[3] == "-":
+            self.enpassant_possible = ()
+        else:
+            self.enpassant_possible = (Move.ranks_to_rows[fields[3][1]], Move.files_to_cols[fields[3][0]])
+        self.halfmove_clock = int(fields[4]) if len(fields) > 4 else 0
+        self.start_fullmove = int(fields[5]) if len(fields) > 5 else 1
+        self.move_log = []
+        self.checkmate = False
+        self.stalemate = False
+        self.in_check = False
+        self.pins = []
+        self.checks = []
+        self.loadDerivedState()
+
+    @classmethod
+    def from_bytes(cls, data):
+        """
+        New game state from a record made by to_bytes, repetition history included.
+        """
+        game_state = cls()
+        game_state.loadBytes(data)
+        return game_state
+
+    def loadBytes(self, data):
+        """
+        Set up the position and its repetition history from a to_bytes record. The moves leading to it
+        are not known, so the state can't undo past it (like after loadFen).
+        """
+        if len(data) != POSITION_BYTES:
+            raise ValueError(f"position record must be {POSITION_BYTES} bytes, got {len(data)}")
+        fields = POSITION_RECORD.unpack(data)
+        squares = [piece for byte in fields[0] for piece in BYTE_PIECES[byte]]
+        if None in squares:
+            raise ValueError("invalid piece code in position record")
+        board = [squares[row * 8:row * 8 + 8] for row in range(8)]
+        try:
+            white_king = squares.index("wK")
+            black_king = squares.index("bK")
+        except ValueError:
+            raise ValueError("position record must have one king per side") from None
+        if fields[1] >> 1 > ALL_CASTLING_RIGHTS:
+            raise ValueError(f"invalid castling rights {fields[1] >> 1} in position record")
+        if not -1 <= fields[2] <= 7:
+            raise ValueError(f"invalid en passant file {fields[2]} in position record")
+        if fields[5] > HISTORY_PLIES:
+            raise ValueError(f"position record history of {fields[5]} plies is longer than {HISTORY_PLIES}")
+        self.board = board
+        self.white_to_move = bool(fields[1] & 1)
+        self.castling_rights = castlingRightsOnBoard(board, fields[1] >> 1)
+        self.white_king_location = divmod(white_king, 8)
+        self.black_king_location = divmod(black_king, 8)
+        self.enpassant_possible = ENPASSANT_SQUARES[self.white_to_move][fields[2]] if fields[2] >= 0 else ()
+        self.halfmove_clock = fields[3]
+        self.start_fullmove = fields[4]
+        self.move_log = []
+        self.checkmate = False
+        self.stalemate = False
+        self.in_check = False
+        self.pins = []
+        self.checks = []
+        self.loadDerivedState()
+        history = fields[5]
+        if history:
+            # the current position moves up to ply `history`, the earlier keys fill the plies below it
+            ply = self.ply = history
+            for stack in (self.castling_stack, self.enpassant_stack, self.halfmove_stack, self.material_stack,
+                          self.position_stack, self.hash_stack):
+                stack[ply] = stack[0]
+            self.hash_stack[:ply] = fields[ply + 5:5:-1]
+
+    def to_bytes(self):
+        """
+        Fixed-size binary record (POSITION_BYTES) of the position with the keys of the plies that can still
+        repeat, a much smaller and faster payload than pickling the game state.
+        """
+        codes = [PIECE_CODE[piece] for row in self.board for piece in row]
+        squares = bytes([codes[index] | codes[index + 1] << 4 for index in range(0, 64, 2)])
+        plies = len(self.move_log)
+        black_started = self.white_to_move == (plies % 2 == 1)
+        fullmove = self.start_fullmove + (plies + black_started) // 2
+        ply = self.ply
+        history = min(ply, self.halfmove_clock, HISTORY_PLIES)
+        keys = self.hash_stack[ply - history:ply][::-1] + [0] * (HISTORY_PLIES - history)
+        return POSITION_RECORD.pack(squares, self.white_to_move | self.castling_rights << 1,
+                                    self.enpassant_possible[1] if self.enpassant_possible else -1,
+                                    min(self.halfmove_clock, 0xFFFF), min(fullmove, 0xFFFF), history, *keys)
+
+    def loadDerivedState(self):
+        """
+        Rebuild everything computed from the board after it was replaced (position key, undo stack).
+        Subclasses that keep their own copy of the position extend this.
+        """
+        self.attack_map_key = None
+        self.legal_moves_key = None
+        self.resetHistory()
+
+    def to_fen(self):
+        """
+        FEN string of the current position.
+        """
+        ranks = []
+        for row in self.board:
+            rank = ""
+            empty = 0
+            for piece in row:
+                if piece == "--":
+                    empty += 1
+                    continue
+                if empty:
+                    rank += str(empty)
+                    empty = 0
+                rank += piece[1].upper() if piece[0] == "w" else piece[1].lower()
+            if empty:
+                rank += str(empty)
+            ranks.append(rank)
+        castling = "".join(char for char, flag in FEN_CASTLING if self.castling_rights & flag) or "-"
+        if self.enpassant_possible:
+            enpassant = Move.cols_to_files[self.enpassant_possible[1]] + Move.rows_to_ranks[self.enpassant_possible[0]]
+        else:
+            enpassant = "-"
+        plies = len(self.move_log)
+        black_started = self.white_to_move == (plies % 2 == 1)
+        fullmove = self.start_fullmove + (plies + black_started) // 2
+        return (f"{'/'.join(ranks)} {'w' if self.white_to_move else 'b'} {castling} {enpassant} "
+                f"{self.halfmove_clock} {fullmove}")
+
+    def to_epd(self, operations=None):
+        """
+        EPD line of the current position: the first four FEN fields followed by the given operations.
+        """
+        epd = " ".join(self.to_fen().split()[:4])
+        for opcode, operand in (operations or {}).items():
+            if operand is None:
+                epd += f" {opcode};"
+            elif isinstance(operand, (list, tuple)):
+                epd += f" {opcode} {' '.join(operand)};"
+            elif " " in operand or opcode in ("id", "c0", "c1", "c2", "c3"):
+                epd += f' {opcode} "{operand}";'
+            else:
+                epd += f" {opcode} {operand};"
+        return epd
+
+    def parseSan(self, san):
+        """
+        Find the legal move written in standard algebraic notation (Nf3, exd5, O-O, e8=Q, Rad1+).
+        Raises ValueError if no legal move or more than one matches.
+        """
+        text = san.rstrip("+#!?")
+        castle = text.replace("0", "O")
+        candidates = []
+        for move in self.getValidMoves():
+            if castle in ("O-O", "O-O-O"):
+                if move.is_castle_move and (move.end_col == 6) == (castle == "O-O"):
+                    candidates.append(move)
+                continue
+            body = text
+            if "=" in body:
+                body, promotion = body.split("=")
+                if promotion.upper() != "Q" or not move.is_pawn_promotion:
+                    continue
+            elif move.is_pawn_promotion:
+                continue
+            piece = body[0] if body[0] in "NBRQK" else "p"
+            if move.piece_moved[1] != piece or move.getRankFile(move.end_row, move.end_col) != body[-2:]:
+                continue
+            hint = body[1 if piece != "p" else 0:-2].replace("x", "")
+            start = move.getRankFile(move.start_row, move.start_col)
+            if all(char in start for char in hint):
+                candidates.append(move)
+        if len(candidates) != 1:
+            raise ValueError(f"{san!r} matches {len(candidates)} legal moves")
+        return candidates[0]
 
     def makeMove(self, move):
         #Thực hiện nước đi được chọn và cập nhật trạng thái trò chơi
-        self.board[move.start_row][move.start_col] = "--"
-        self.board[move.end_row][move.end_col] = move.piece_moved
-        self.move_log.append(move) 
-        self.white_to_move = not self.white_to_move  
+        ply = self.ply + 1
+        if ply == len(self.hash_stack):
+            self.growUndoStack()
+        board = self.board
+        key = self.zobrist_key ^ ZOBRIST_BLACK_TO_MOVE
+        start_square = move.start_row * 8 + move.start_col
+        end_square = move.end_row * 8 + move.end_col
+        key ^= ZOBRIST_PIECES[move.piece_moved][start_square]
+        position = self.position_score - POSITION_SCORES[move.piece_moved][start_square]
+        if move.piece_captured != "--":
+            captured_square = move.start_row * 8 + move.end_col if move.is_enpassant_move else end_square
+            key ^= ZOBRIST_PIECES[move.piece_captured][captured_square]
+            self.material_score -= MATERIAL_SCORES[move.piece_captured]
+            position -= POSITION_SCORES[move.piece_captured][captured_square]
+        if self.enpassant_possible:
+            key ^= ZOBRIST_ENPASSANT[self.enpassant_possible[1]]
+        board[move.start_row][move.start_col] = "--"
+        board[move.end_row][move.end_col] = move.piece_moved
+        self.move_log.append(move)
+        self.white_to_move = not self.white_to_move
         # update king's location if moved
         if move.piece_moved == "wK":
             self.white_king_location = (move.end_row, move.end_col)
@@ -48,42 +536,65 @@ class GameState:
             #    promoted_piece = input("Promote to Q, R, B, or N:") #take this to UI later
             #    self.board[move.end_row][move.end_col] = move.piece_moved[0] + promoted_piece
             # else:
-            self.board[move.end_row][move.end_col] = move.piece_moved[0] + "Q"
+            board[move.end_row][move.end_col] = move.piece_moved[0] + "Q"
+            self.material_score += MATERIAL_SCORES[move.piece_moved[0] + "Q"] - MATERIAL_SCORES[move.piece_moved]
+        key ^= ZOBRIST_PIECES[board[move.end_row][move.end_col]][end_square]
+        position += POSITION_SCORES[board[move.end_row][move.end_col]][end_square]
 
         # enpassant move
         if move.is_enpassant_move:
-            self.board[move.start_row][move.end_col] = "--"  # capturing the pawn
+            board[move.start_row][move.end_col] = "--"  # capturing the pawn
 
         # update enpassant_possible variable
         if move.piece_moved[1] == "p" and abs(move.start_row - move.end_row) == 2:  # only on 2 square pawn advance
-            self.enpassant_possible = ((move.start_row + move.end_row) // 2, move.start_col)
+            self.enpassant_possible = ENPASSANT_SQUARES[self.white_to_move][move.start_col]
+            self.enpassant_stack[ply] = move.start_col
+            key ^= ZOBRIST_ENPASSANT[move.start_col]
         else:
             self.enpassant_possible = ()
+            self.enpassant_stack[ply] = -1
 
         # castle move
         if move.is_castle_move:
+            rook = move.piece_moved[0] + "R"
             if move.end_col - move.start_col == 2:  # king-side castle move
-                self.board[move.end_row][move.end_col - 1] = self.board[move.end_row][
+                board[move.end_row][move.end_col - 1] = board[move.end_row][
                     move.end_col + 1]  # moves the rook to its new square
-                self.board[move.end_row][move.end_col + 1] = '--'  # erase old rook
+                board[move.end_row][move.end_col + 1] = '--'  # erase old rook
+                key ^= ZOBRIST_PIECES[rook][end_square + 1] ^ ZOBRIST_PIECES[rook][end_square - 1]
+                position += POSITION_SCORES[rook][end_square - 1] - POSITION_SCORES[rook][end_square + 1]
             else:  # queen-side castle move
-                self.board[move.end_row][move.end_col + 1] = self.board[move.end_row][
+                board[move.end_row][move.end_col + 1] = board[move.end_row][
                     move.end_col - 2]  # moves the rook to its new square
-                self.board[move.end_row][move.end_col - 2] = '--'  # erase old rook
-
-        self.enpassant_possible_log.append(self.enpassant_possible)
+                board[move.end_row][move.end_col - 2] = '--'  # erase old rook
+                key ^= ZOBRIST_PIECES[rook][end_square - 2] ^ ZOBRIST_PIECES[rook][end_square + 1]
+                position += POSITION_SCORES[rook][end_square + 1] - POSITION_SCORES[rook][end_square - 2]
 
         # update quyền được phép nhập thành
+        key ^= ZOBRIST_CASTLING[self.castling_rights]
         self.updateCastleRights(move)
-        self.castle_rights_log.append(CastleRights(self.current_castling_rights.wks, self.current_castling_rights.bks,
-                                                   self.current_castling_rights.wqs, self.current_castling_rights.bqs))
+        key ^= ZOBRIST_CASTLING[self.castling_rights]
+        if move.piece_moved[1] == "p" or move.piece_captured != "--":
+            self.halfmove_clock = 0
+        else:
+            self.halfmove_clock += 1
+        self.castling_stack[ply] = self.castling_rights
+        self.captured_stack[ply] = move.piece_captured
+        self.halfmove_stack[ply] = self.halfmove_clock
+        self.material_stack[ply] = self.material_score
+        self.position_stack[ply] = self.position_score = position
+        self.hash_stack[ply] = key
+        self.zobrist_key = key
+        self.ply = ply
 
     def undoMove(self):
         
         if len(self.move_log) != 0:  # make sure that there is a move to undo
             move = self.move_log.pop()
-            self.board[move.start_row][move.start_col] = move.piece_moved
-            self.board[move.end_row][move.end_col] = move.piece_captured
+            board = self.board
+            captured = self.captured_stack[self.ply]
+            board[move.start_row][move.start_col] = move.piece_moved
+            board[move.end_row][move.end_col] = captured
             self.white_to_move = not self.white_to_move  # swap players
             # update the king's position if needed
             if move.piece_moved == "wK":
@@ -92,67 +603,116 @@ class GameState:
                 self.black_king_location = (move.start_row, move.start_col)
             # undo en passant move
             if move.is_enpassant_move:
-                self.board[move.end_row][move.end_col] = "--"  # leave landing square blank
-                self.board[move.start_row][move.end_col] = move.piece_captured
+                board[move.end_row][move.end_col] = "--"  # leave landing square blank
+                board[move.start_row][move.end_col] = captured
 
-            self.enpassant_possible_log.pop()
-            self.enpassant_possible = self.enpassant_possible_log[-1]
+            # restore castling rights, en passant square and key from the previous ply
+            self.ply -= 1
+            ply = self.ply
+            self.castling_rights = self.castling_stack[ply]
+            enpassant_file = self.enpassant_stack[ply]
+            if enpassant_file >= 0:
+                self.enpassant_possible = ENPASSANT_SQUARES[self.white_to_move][enpassant_file]
+            else:
+                self.enpassant_possible = ()
+            self.halfmove_clock = self.halfmove_stack[ply]
+            self.material_score = self.material_stack[ply]
+            self.position_score = self.position_stack[ply]
+            self.zobrist_key = self.hash_stack[ply]
 
-            # undo castle rights
-            self.castle_rights_log.pop()  # get rid of the new castle rights from the move we are undoing
-            self.current_castling_rights = self.castle_rights_log[
-                -1]  # set the current castle rights to the last one in the list
             # undo the castle move
             if move.is_castle_move:
                 if move.end_col - move.start_col == 2:  # king-side
-                    self.board[move.end_row][move.end_col + 1] = self.board[move.end_row][move.end_col - 1]
-                    self.board[move.end_row][move.end_col - 1] = '--'
+                    board[move.end_row][move.end_col + 1] = board[move.end_row][move.end_col - 1]
+                    board[move.end_row][move.end_col - 1] = '--'
                 else:  # queen-side
-                    self.board[move.end_row][move.end_col - 2] = self.board[move.end_row][move.end_col + 1]
-                    self.board[move.end_row][move.end_col + 1] = '--'
+                    board[move.end_row][move.end_col - 2] = board[move.end_row][move.end_col + 1]
+                    board[move.end_row][move.end_col + 1] = '--'
             self.checkmate = False
             self.stalemate = False
 
+    def makeNullMove(self):
+        """
+        Pass the turn without moving a piece (for null-move pruning). Must not be called while in check.
+        The halfmove clock restarts, so repetitions are not looked for across a null move.
+        """
+        ply = self.ply + 1
+        if ply == len(self.hash_stack):
+            self.growUndoStack()
+        key = self.zobrist_key ^ ZOBRIST_BLACK_TO_MOVE
+        if self.enpassant_possible:
+            key ^= ZOBRIST_ENPASSANT[self.enpassant_possible[1]]
+            self.enpassant_possible = ()
+        self.white_to_move = not self.white_to_move
+        self.castling_stack[ply] = self.castling_rights
+        self.enpassant_stack[ply] = -1
+        self.captured_stack[ply] = "--"
+        self.halfmove_clock = self.halfmove_stack[ply] = 0
+        self.material_stack[ply] = self.material_score
+        self.position_stack[ply] = self.position_score
+        self.hash_stack[ply] = key
+        self.zobrist_key = key
+        self.ply = ply
+
+    def undoNullMove(self):
+        self.ply -= 1
+        self.white_to_move = not self.white_to_move
+        enpassant_file = self.enpassant_stack[self.ply]
+        if enpassant_file >= 0:
+            self.enpassant_possible = ENPASSANT_SQUARES[self.white_to_move][enpassant_file]
+        self.halfmove_clock = self.halfmove_stack[self.ply]
+        self.zobrist_key = self.hash_stack[self.ply]
+
+    def isRepetition(self, occurrences=1):
+        """
+        True if the current position already occurred at least `occurrences` times before.
+        Only positions since the last capture or pawn move can repeat, and only with the same side to move,
+        so this looks at every other key of that stretch of hash_stack.
+        """
+        key = self.zobrist_key
+        hash_stack = self.hash_stack
+        count = 0
+        for ply in range(self.ply - 4, max(self.ply - self.halfmove_clock, 0) - 1, -2):
+            if hash_stack[ply] == key:
+                count += 1
+                if count >= occurrences:
+                    return True
+        return False
+
+    def isDrawByRule(self):
+        """
+        Threefold repetition or fifty-move rule.
+        """
+        return self.halfmove_clock >= 100 or self.isRepetition(2)
+
     def updateCastleRights(self, move):
         """
-        Update the castle rights given the move
-        """
-        if move.piece_captured == "wR":
-            if move.end_col == 0:  # left rook
-                self.current_castling_rights.wqs = False
-            elif move.end_col == 7:  # right rook
-                self.current_castling_rights.wks = False
-        elif move.piece_captured == "bR":
-            if move.end_col == 0:  # left rook
-                self.current_castling_rights.bqs = False
-            elif move.end_col == 7:  # right rook
-                self.current_castling_rights.bks = False
-
-        if move.piece_moved == 'wK':
-            self.current_castling_rights.wqs = False
-            self.current_castling_rights.wks = False
-        elif move.piece_moved == 'bK':
-            self.current_castling_rights.bqs = False
-            self.current_castling_rights.bks = False
-        elif move.piece_moved == 'wR':
-            if move.start_row == 7:
-                if move.start_col == 0:  # left rook
-                    self.current_castling_rights.wqs = False
-                elif move.start_col == 7:  # right rook
-                    self.current_castling_rights.wks = False
-        elif move.piece_moved == 'bR':
-            if move.start_row == 0:
-                if move.start_col == 0:  # left rook
-                    self.current_castling_rights.bqs = False
-                elif move.start_col == 7:  # right rook
-                    self.current_castling_rights.bks = False
+        Update the castle rights given the move: moving from or capturing on a king or rook home square
+        drops the matching rights.
+        """
+        self.castling_rights &= (CASTLING_RIGHTS_MASK[move.start_row * 8 + move.start_col] &
+                                 CASTLING_RIGHTS_MASK[move.end_row * 8 + move.end_col])
 
     def getValidMoves(self):
         """
         All moves considering checks.
         """
-        temp_castle_rights = CastleRights(self.current_castling_rights.wks, self.current_castling_rights.bks,
-                                          self.current_castling_rights.wqs, self.current_castling_rights.bqs)
+        moves = self.generateLegalMoves()
+        if len(moves) == 0:
+            if self.inCheck():
+                self.checkmate = True
+            else:
+                self.stalemate = True
+        else:
+            self.checkmate = False
+            self.stalemate = self.isDrawByRule()  # hòa do lặp lại 3 lần hoặc luật 50 nước
+
+        return moves
+
+    def generateLegalMoves(self):
+        """
+        Legal moves of the position, without touching the checkmate/stalemate flags.
+        """
         # advanced algorithm
         moves = []
         self.in_check, self.pins, self.checks = self.checkForPinsAndChecks()
@@ -188,7 +748,10 @@ class GameState:
                     if moves[i].piece_moved[1] != "K":  # move doesn't move king so it must block or capture
                         if not (moves[i].end_row,
                                 moves[i].end_col) in valid_squares:  # move doesn't block or capture piece
-                            moves.remove(moves[i])
+                            # en passant captures the checking pawn without landing on its square
+                            if not (moves[i].is_enpassant_move and moves[i].start_row == check_row and
+                                    moves[i].end_col == check_col):
+                                moves.remove(moves[i])
             else:  # double check, king has to move
                 self.getKingMoves(king_row, king_col, moves)
         else:  # not in check - all moves are fine
@@ -197,19 +760,95 @@ class GameState:
                 self.getCastleMoves(self.white_king_location[0], self.white_king_location[1], moves)
             else:
                 self.getCastleMoves(self.black_king_location[0], self.black_king_location[1], moves)
+        return moves
 
-        if len(moves) == 0:
-            if self.inCheck():
-                self.checkmate = True
+    def getCachedLegalMoves(self):
+        """
+        Legal moves of the position, generated once per position (like getEnemyAttackMap) so that the staged
+        getters below share one generation. The list is shared, callers must not modify it.
+        """
+        if self.legal_moves_key == self.zobrist_key:
+            self.in_check = self.legal_moves_in_check
+            return self.legal_moves
+        self.legal_moves = self.generateLegalMoves()
+        self.legal_moves_in_check = self.in_check
+        self.legal_moves_key = self.zobrist_key
+        return self.legal_moves
+
+    def generateValidMoves(self):
+        """
+        Legal moves in two stages, captures and promotions first, then quiet moves.
+        The mailbox generator works on the whole move list, so here the stages only order the moves;
+        the bitboard backend generates the quiet moves only when they are asked for.
+        """
+        moves = self.getCachedLegalMoves()
+        quiet_moves = []
+        for move in moves:
+            if move.piece_captured != "--" or move.is_pawn_promotion:
+                yield move
             else:
-                # TODO stalemate on repeated moves
-                self.stalemate = True
-        else:
-            self.checkmate = False
-            self.stalemate = False
+                quiet_moves.append(move)
+        yield from quiet_moves
 
-        self.current_castling_rights = temp_castle_rights
-        return moves
+    def getValidCaptures(self):
+        """
+        Legal captures (en passant included) and promotions.
+        """
+        return [move for move in self.getCachedLegalMoves() if move.piece_captured != "--" or move.is_pawn_promotion]
+
+    def getValidQuietMoves(self):
+        """
+        Legal moves that neither capture nor promote, castling included.
+        """
+        return [move for move in self.getCachedLegalMoves()
+                if move.piece_captured == "--" and not move.is_pawn_promotion]
+
+    def hasLegalMove(self):
+        """
+        True if the side to move has at least one legal move. Stops at the first piece that can move and
+        leaves the checkmate/stalemate flags alone.
+        """
+        self.in_check, self.pins, self.checks = self.checkForPinsAndChecks()
+        if self.in_check:
+            # check evasions need the filtering done in getValidMoves
+            checkmate, stalemate = self.checkmate, self.stalemate
+            has_move = len(self.getValidMoves()) > 0
+            self.checkmate, self.stalemate = checkmate, stalemate
+            return has_move
+        ally_color = "w" if self.white_to_move else "b"
+        moves = []
+        for row in range(8):
+            for col in range(8):
+                piece = self.board[row][col]
+                if piece[0] == ally_color:
+                    self.moveFunctions[piece[1]](row, col, moves)
+                    if moves:
+                        return True
+        return False  # castling is never the only legal move: the king could also step towards the rook
+
+    def getTerminalStatus(self):
+        """
+        Whether the game is over in the current position, as one of the STATUS_* values.
+        Unlike the checkmate/stalemate flags this does not depend on which move list was generated last.
+        """
+        if not self.hasLegalMove():
+            return STATUS_CHECKMATE if self.in_check else STATUS_STALEMATE
+        if self.halfmove_clock >= 100:
+            return STATUS_FIFTY_MOVE_DRAW
+        if self.isRepetition(2):
+            return STATUS_REPETITION_DRAW
+        return STATUS_ONGOING
+
+    def hasNonPawnMaterial(self):
+        """
+        True if the side to move has a piece other than its king and pawns (null-move pruning is unsafe otherwise).
+        """
+        ally_color = "w" if self.white_to_move else "b"
+        for row in self.board:
+            for piece in row:
+                if piece[0] == ally_color and piece[1] not in "pK":
+                    return True
+        return False
 
     def inCheck(self):
         """
@@ -222,14 +861,38 @@ class GameState:
 
     def squareUnderAttack(self, row, col):
         """
-        Determine if enemy can attack the square row col
+        Determine if enemy can attack the square row col.
+        Looks outward from the square for attackers instead of generating the opponent's moves.
         """
-        self.white_to_move = not self.white_to_move  # switch to opponent's point of view
-        opponents_moves = self.getAllPossibleMoves()
-        self.white_to_move = not self.white_to_move
-        for move in opponents_moves:
-            if move.end_row == row and move.end_col == col:  # square is under attack
+        board = self.board
+        if self.white_to_move:
+            enemy_color = "b"
+            pawn_row = row - 1  # black pawns attack downwards
+        else:
+            enemy_color = "w"
+            pawn_row = row + 1
+        # pawn diagonals
+        if 0 <= pawn_row <= 7:
+            if col - 1 >= 0 and board[pawn_row][col - 1] == enemy_color + "p":
                 return True
+            if col + 1 <= 7 and board[pawn_row][col + 1] == enemy_color + "p":
+                return True
+        # knight jumps
+        enemy_knight = enemy_color + "N"
+        for end_row, end_col in KNIGHT_TARGETS[row][col]:
+            if board[end_row][end_col] == enemy_knight:
+                return True
+        # rays: the first piece met decides, orthogonal for rooks and diagonal for bishops, 1 square for the king
+        rays = RAYS[row][col]
+        for j in range(8):
+            slider = "R" if j <= 3 else "B"
+            for i, (end_row, end_col) in enumerate(rays[j]):
+                end_piece = board[end_row][end_col]
+                if end_piece != "--":
+                    if end_piece[0] == enemy_color and (end_piece[1] == slider or end_piece[1] == "Q" or (
+                            i == 0 and end_piece[1] == "K")):
+                        return True
+                    break
         return False
 
     def getAllPossibleMoves(self):
@@ -260,53 +923,44 @@ class GameState:
             start_row = self.black_king_location[0]
             start_col = self.black_king_location[1]
         # check outwards from king for pins and checks, keep track of pins
-        directions = ((-1, 0), (0, -1), (1, 0), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1))
-        for j in range(len(directions)):
-            direction = directions[j]
+        board = self.board
+        rays = RAYS[start_row][start_col]
+        for j in range(8):
             possible_pin = ()  # reset possible pins
-            for i in range(1, 8):
-                end_row = start_row + direction[0] * i
-                end_col = start_col + direction[1] * i
-                if 0 <= end_row <= 7 and 0 <= end_col <= 7:
-                    end_piece = self.board[end_row][end_col]
-                    if end_piece[0] == ally_color and end_piece[1] != "K":
-                        if possible_pin == ():  # first allied piece could be pinned
-                            possible_pin = (end_row, end_col, direction[0], direction[1])
-                        else:  # 2nd allied piece - no check or pin from this direction
+            for i, (end_row, end_col) in enumerate(rays[j], start=1):
+                end_piece = board[end_row][end_col]
+                if end_piece[0] == ally_color and end_piece[1] != "K":
+                    if possible_pin == ():  # first allied piece could be pinned
+                        possible_pin = (end_row, end_col) + DIRECTIONS[j]
+                    else:  # 2nd allied piece - no check or pin from this direction
+                        break
+                elif end_piece[0] == enemy_color:
+                    enemy_type = end_piece[1]
+                    # 5 possibilities in this complex conditional
+                    # 1.) orthogonally away from king and piece is a rook
+                    # 2.) diagonally away from king and piece is a bishop
+                    # 3.) 1 square away diagonally from king and piece is a pawn
+                    # 4.) any direction and piece is a queen
+                    # 5.) any direction 1 square away and piece is a king
+                    if (0 <= j <= 3 and enemy_type == "R") or (4 <= j <= 7 and enemy_type == "B") or (
+                            i == 1 and enemy_type == "p" and (
+                            (enemy_color == "w" and 6 <= j <= 7) or (enemy_color == "b" and 4 <= j <= 5))) or (
+                            enemy_type == "Q") or (i == 1 and enemy_type == "K"):
+                        if possible_pin == ():  # no piece blocking, so check
+                            in_check = True
+                            checks.append((end_row, end_col) + DIRECTIONS[j])
                             break
-                    elif end_piece[0] == enemy_color:
-                        enemy_type = end_piece[1]
-                        # 5 possibilities in this complex conditional
-                        # 1.) orthogonally away from king and piece is a rook
-                        # 2.) diagonally away from king and piece is a bishop
-                        # 3.) 1 square away diagonally from king and piece is a pawn
-                        # 4.) any direction and piece is a queen
-                        # 5.) any direction 1 square away and piece is a king
-                        if (0 <= j <= 3 and enemy_type == "R") or (4 <= j <= 7 and enemy_type == "B") or (
-                                i == 1 and enemy_type == "p" and (
-                                (enemy_color == "w" and 6 <= j <= 7) or (enemy_color == "b" and 4 <= j <= 5))) or (
-                                enemy_type == "Q") or (i == 1 and enemy_type == "K"):
-                            if possible_pin == ():  # no piece blocking, so check
-                                in_check = True
-                                checks.append((end_row, end_col, direction[0], direction[1]))
-                                break
-                            else:  # piece blocking so pin
-                                pins.append(possible_pin)
-                                break
-                        else:  # enemy piece not applying checks
+                        else:  # piece blocking so pin
+                            pins.append(possible_pin)
                             break
-                else:
-                    break  # off board
+                    else:  # enemy piece not applying checks
+                        break
         # check for knight checks
-        knight_moves = ((-2, -1), (-2, 1), (-1, 2), (1, 2), (2, -1), (2, 1), (-1, -2), (1, -2))
-        for move in knight_moves:
-            end_row = start_row + move[0]
-            end_col = start_col + move[1]
-            if 0 <= end_row <= 7 and 0 <= end_col <= 7:
-                end_piece = self.board[end_row][end_col]
-                if end_piece[0] == enemy_color and end_piece[1] == "N":  # enemy knight attacking a king
-                    in_check = True
-                    checks.append((end_row, end_col, move[0], move[1]))
+        enemy_knight = enemy_color + "N"
+        for end_row, end_col in KNIGHT_TARGETS[start_row][start_col]:
+            if board[end_row][end_col] == enemy_knight:  # enemy knight attacking a king
+                in_check = True
+                checks.append((end_row, end_col, end_row - start_row, end_col - start_col))
         return in_check, pins, checks
 
     def getPawnMoves(self, row, col, moves):
@@ -332,7 +986,7 @@ class GameState:
             king_row, king_col = self.black_king_location
 
         if self.board[row + move_amount][col] == "--":  # 1 square pawn advance
-            if not piece_pinned or pin_direction == (move_amount, 0):
+            if not piece_pinned or pin_direction == (move_amount, 0) or pin_direction == (-move_amount, 0):
                 moves.append(Move((row, col), (row + move_amount, col), self.board))
                 if row == start_row and self.board[row + 2 * move_amount][col] == "--":  # 2 square pawn advance
                     moves.append(Move((row, col), (row + 2 * move_amount, col), self.board))
@@ -358,8 +1012,10 @@ class GameState:
                             square = self.board[row][i]
                             if square[0] == enemy_color and (square[1] == "R" or square[1] == "Q"):
                                 attacking_piece = True
+                                break
                             elif square != "--":
                                 blocking_piece = True
+                                break
                     if not attacking_piece or blocking_piece:
                         moves.append(Move((row, col), (row + move_amount, col - 1), self.board, is_enpassant_move=True))
         if col + 1 <= 7:  # capture to the right
@@ -384,8 +1040,10 @@ class GameState:
                             square = self.board[row][i]
                             if square[0] == enemy_color and (square[1] == "R" or square[1] == "Q"):
                                 attacking_piece = True
+                                break
                             elif square != "--":
                                 blocking_piece = True
+                                break
                     if not attacking_piece or blocking_piece:
                         moves.append(Move((row, col), (row + move_amount, col + 1), self.board, is_enpassant_move=True))
 
@@ -404,24 +1062,20 @@ class GameState:
                     self.pins.remove(self.pins[i])
                 break
 
-        directions = ((-1, 0), (0, -1), (1, 0), (0, 1))  # up, left, down, right
         enemy_color = "b" if self.white_to_move else "w"
-        for direction in directions:
-            for i in range(1, 8):
-                end_row = row + direction[0] * i
-                end_col = col + direction[1] * i
-                if 0 <= end_row <= 7 and 0 <= end_col <= 7:  # check for possible moves only in boundaries of the board
-                    if not piece_pinned or pin_direction == direction or pin_direction == (
-                            -direction[0], -direction[1]):
-                        end_piece = self.board[end_row][end_col]
-                        if end_piece == "--":  # empty space is valid
-                            moves.append(Move((row, col), (end_row, end_col), self.board))
-                        elif end_piece[0] == enemy_color:  # capture enemy piece
-                            moves.append(Move((row, col), (end_row, end_col), self.board))
-                            break
-                        else:  # friendly piece
-                            break
-                else:  # off board
+        board = self.board
+        rays = RAYS[row][col]
+        for j in range(4):  # up, left, down, right
+            if piece_pinned and pin_direction != DIRECTIONS[j] and pin_direction != OPPOSITE_DIRECTIONS[j]:
+                continue  # a pinned piece may only move along the pin
+            for end_row, end_col in rays[j]:
+                end_piece = board[end_row][end_col]
+                if end_piece == "--":  # empty space is valid
+                    moves.append(Move((row, col), (end_row, end_col), board))
+                elif end_piece[0] == enemy_color:  # capture enemy piece
+                    moves.append(Move((row, col), (end_row, end_col), board))
+                    break
+                else:  # friendly piece
                     break
 
     def getKnightMoves(self, row, col, moves):
@@ -435,17 +1089,13 @@ class GameState:
                 self.pins.remove(self.pins[i])
                 break
 
-        knight_moves = ((-2, -1), (-2, 1), (-1, 2), (1, 2), (2, -1), (2, 1), (-1, -2),
-                        (1, -2))  # up/left up/right right/up right/down down/left down/right left/up left/down
+        if piece_pinned:
+            return  # a pinned knight can never move
         ally_color = "w" if self.white_to_move else "b"
-        for move in knight_moves:
-            end_row = row + move[0]
-            end_col = col + move[1]
-            if 0 <= end_row <= 7 and 0 <= end_col <= 7:
-                if not piece_pinned:
-                    end_piece = self.board[end_row][end_col]
-                    if end_piece[0] != ally_color:  # so its either enemy piece or empty square
-                        moves.append(Move((row, col), (end_row, end_col), self.board))
+        board = self.board
+        for end_row, end_col in KNIGHT_TARGETS[row][col]:
+            if board[end_row][end_col][0] != ally_color:  # so its either enemy piece or empty square
+                moves.append(Move((row, col), (end_row, end_col), board))
 
     def getBishopMoves(self, row, col, moves):
         """
@@ -460,84 +1110,158 @@ class GameState:
                 self.pins.remove(self.pins[i])
                 break
 
-        directions = ((-1, -1), (-1, 1), (1, 1), (1, -1))  # diagonals: up/left up/right down/right down/left
         enemy_color = "b" if self.white_to_move else "w"
-        for direction in directions:
-            for i in range(1, 8):
-                end_row = row + direction[0] * i
-                end_col = col + direction[1] * i
-                if 0 <= end_row <= 7 and 0 <= end_col <= 7:  # check if the move is on board
-                    if not piece_pinned or pin_direction == direction or pin_direction == (
-                            -direction[0], -direction[1]):
-                        end_piece = self.board[end_row][end_col]
-                        if end_piece == "--":  # empty space is valid
-                            moves.append(Move((row, col), (end_row, end_col), self.board))
-                        elif end_piece[0] == enemy_color:  # capture enemy piece
-                            moves.append(Move((row, col), (end_row, end_col), self.board))
-                            break
-                        else:  # friendly piece
-                            break
-                else:  # off board
+        board = self.board
+        rays = RAYS[row][col]
+        for j in range(4, 8):  # diagonals: up/left up/right down/left down/right
+            if piece_pinned and pin_direction != DIRECTIONS[j] and pin_direction != OPPOSITE_DIRECTIONS[j]:
+                continue  # a pinned piece may only move along the pin
+            for end_row, end_col in rays[j]:
+                end_piece = board[end_row][end_col]
+                if end_piece == "--":  # empty space is valid
+                    moves.append(Move((row, col), (end_row, end_col), board))
+                elif end_piece[0] == enemy_color:  # capture enemy piece
+                    moves.append(Move((row, col), (end_row, end_col), board))
+                    break
+                else:  # friendly piece
                     break
 
     def getQueenMoves(self, row, col, moves):
         """
         Get all the queen moves for the queen located at row col and add the moves to the list.
         """
-        self.getBishopMoves(row, col, moves)
+        # rook moves first: getRookMoves keeps a queen's pin in self.pins, getBishopMoves then removes it
         self.getRookMoves(row, col, moves)
+        self.getBishopMoves(row, col, moves)
 
     def getKingMoves(self, row, col, moves):
         """
         Get all the king moves for the king located at row col and add the moves to the list.
         """
-        row_moves = (-1, -1, -1, 0, 0, 1, 1, 1)
-        col_moves = (-1, 0, 1, -1, 1, -1, 0, 1)
         ally_color = "w" if self.white_to_move else "b"
-        for i in range(8):
-            end_row = row + row_moves[i]
-            end_col = col + col_moves[i]
-            if 0 <= end_row <= 7 and 0 <= end_col <= 7:
-                end_piece = self.board[end_row][end_col]
-                if end_piece[0] != ally_color:  # not an ally piece - empty or enemy
-                    # place king on end square and check for checks
-                    if ally_color == "w":
-                        self.white_king_location = (end_row, end_col)
-                    else:
-                        self.black_king_location = (end_row, end_col)
-                    in_check, pins, checks = self.checkForPinsAndChecks()
-                    if not in_check:
-                        moves.append(Move((row, col), (end_row, end_col), self.board))
-                    # place king back on original location
-                    if ally_color == "w":
-                        self.white_king_location = (row, col)
-                    else:
-                        self.black_king_location = (row, col)
+        attacked = self.getEnemyAttackMap()
+        board = self.board
+        for end_row, end_col in KING_TARGETS[row][col]:
+            # not an ally piece - empty or enemy, and not a square the enemy attacks
+            if board[end_row][end_col][0] != ally_color and not (attacked >> (end_row * 8 + end_col)) & 1:
+                moves.append(Move((row, col), (end_row, end_col), board))
+
+    def getEnemyAttackMap(self):
+        """
+        Squares attacked by the opponent as a bit mask (bit row * 8 + col), computed once per position.
+        The king of the side to move is lifted off the board while scanning, so a square behind it on
+        the line of a checking slider also counts as attacked.
+        """
+        if self.attack_map_key == self.zobrist_key:
+            return self.attack_map
+        board = self.board
+        if self.white_to_move:
+            enemy_color = "b"
+            pawn_step = 1  # black pawns attack downwards
+            king_row, king_col = self.white_king_location
+        else:
+            enemy_color = "w"
+            pawn_step = -1
+            king_row, king_col = self.black_king_location
+        king = board[king_row][king_col]
+        board[king_row][king_col] = "--"
+        attacked = 0
+        for row in range(8):
+            for col in range(8):
+                piece = board[row][col]
+                if piece[0] != enemy_color:
+                    continue
+                piece_type = piece[1]
+                if piece_type == "p":
+                    end_row = row + pawn_step
+                    if 0 <= end_row <= 7:
+                        if col - 1 >= 0:
+                            attacked |= 1 << (end_row * 8 + col - 1)
+                        if col + 1 <= 7:
+                            attacked |= 1 << (end_row * 8 + col + 1)
+                elif piece_type == "N":
+                    for end_row, end_col in KNIGHT_TARGETS[row][col]:
+                        attacked |= 1 << (end_row * 8 + end_col)
+                elif piece_type == "K":
+                    for end_row, end_col in KING_TARGETS[row][col]:
+                        attacked |= 1 << (end_row * 8 + end_col)
+                else:
+                    rays = RAYS[row][col]
+                    first = 4 if piece_type == "B" else 0
+                    last = 4 if piece_type == "R" else 8
+                    for j in range(first, last):
+                        for end_row, end_col in rays[j]:
+                            attacked |= 1 << (end_row * 8 + end_col)
+                            if board[end_row][end_col] != "--":
+                                break
+        board[king_row][king_col] = king
+        self.attack_map = attacked
+        self.attack_map_key = self.zobrist_key
+        return attacked
 
     def getCastleMoves(self, row, col, moves):
         """
         Generate all valid castle moves for the king at (row, col) and add them to the list of moves.
         """
-        if self.squareUnderAttack(row, col):
+        if (self.getEnemyAttackMap() >> (row * 8 + col)) & 1:
             return  # can't castle while in check
-        if (self.white_to_move and self.current_castling_rights.wks) or (
-                not self.white_to_move and self.current_castling_rights.bks):
+        if self.castling_rights & (WHITE_KINGSIDE if self.white_to_move else BLACK_KINGSIDE):
             self.getKingsideCastleMoves(row, col, moves)
-        if (self.white_to_move and self.current_castling_rights.wqs) or (
-                not self.white_to_move and self.current_castling_rights.bqs):
+        if self.castling_rights & (WHITE_QUEENSIDE if self.white_to_move else BLACK_QUEENSIDE):
             self.getQueensideCastleMoves(row, col, moves)
 
     def getKingsideCastleMoves(self, row, col, moves):
         if self.board[row][col + 1] == '--' and self.board[row][col + 2] == '--':
-            if not self.squareUnderAttack(row, col + 1) and not self.squareUnderAttack(row, col + 2):
+            # the two squares the king passes, (row, col + 1) and (row, col + 2), must not be attacked
+            if not (self.getEnemyAttackMap() >> (row * 8 + col + 1)) & 0b11:
                 moves.append(Move((row, col), (row, col + 2), self.board, is_castle_move=True))
 
     def getQueensideCastleMoves(self, row, col, moves):
         if self.board[row][col - 1] == '--' and self.board[row][col - 2] == '--' and self.board[row][col - 3] == '--':
-            if not self.squareUnderAttack(row, col - 1) and not self.squareUnderAttack(row, col - 2):
+            # the two squares the king passes, (row, col - 2) and (row, col - 1), must not be attacked
+            if not (self.getEnemyAttackMap() >> (row * 8 + col - 2)) & 0b11:
                 moves.append(Move((row, col), (row, col - 2), self.board, is_castle_move=True))
 
 
+def parseEpdOperations(text):
+    """
+    Split the operation part of an EPD line ('bm Qd1+; id "WAC.001";') into a dict.
+    """
+    operations = {}
+    position = 0
+    while position < len(text):
+        end = position
+        quoted = False
+        while end < len(text) and (text[end] != ";" or quoted):
+            if text[end] == '"':
+                quoted = not quoted
+            end += 1
+        operation = text[position:end].strip()
+        position = end + 1
+        if not operation:
+            continue
+        opcode, _, operand = operation.partition(" ")
+        operand = operand.strip()
+        if opcode in ("bm", "am", "pv"):
+            operations[opcode] = operand.split()
+        elif operand.startswith('"') and operand.endswith('"') and len(operand) > 1:
+            operations[opcode] = operand[1:-1]
+        else:
+            operations[opcode] = operand or None
+    return operations
+
+
+def castlingRightsOnBoard(board, rights):
+    """
+    The castling rights whose king and rook are still on their home squares; a FEN or a record may claim
+    rights the board can't have.
+    """
+    for flag, pieces in CASTLING_PIECES:
+        if rights & flag and any(board[row][col] != piece for row, col, piece in pieces):
+            rights &= ~flag
+    return rights
+
+
 class CastleRights:
     def __init__(self, wks, bks, wqs, bqs):
         self.wks = wks
@@ -545,6 +1269,12 @@ class CastleRights:
         self.wqs = wqs
         self.bqs = bqs
 
+    def index(self):
+        """
+        Pack the four rights into a number from 0 to 15.
+        """
+        return self.wks | (self.bks << 1) | (self.wqs << 2) | (self.bqs << 3)
+
 
 class Move:
     # in chess, fields on the board are described by two symbols, one of them being number between 1-8 (which is corresponding to rows)
@@ -557,25 +1287,34 @@ class Move:
                      "e": 4, "f": 5, "g": 6, "h": 7}
     cols_to_files = {v: k for k, v in files_to_cols.items()}
 
+    # hundreds of thousands of moves are created per search, __slots__ keeps each one small and skips the __dict__
+    __slots__ = ("start_row", "start_col", "end_row", "end_col", "piece_moved", "piece_captured",
+                 "is_pawn_promotion", "is_enpassant_move", "is_castle_move", "moveID")
+
     def __init__(self, start_square, end_square, board, is_enpassant_move=False, is_castle_move=False):
-        self.start_row = start_square[0]
-        self.start_col = start_square[1]
-        self.end_row = end_square[0]
-        self.end_col = end_square[1]
-        self.piece_moved = board[self.start_row][self.start_col]
-        self.piece_captured = board[self.end_row][self.end_col]
+        start_row, start_col = start_square
+        end_row, end_col = end_square
+        self.start_row = start_row
+        self.start_col = start_col
+        self.end_row = end_row
+        self.end_col = end_col
+        piece_moved = self.piece_moved = board[start_row][start_col]
         # pawn promotion
-        self.is_pawn_promotion = (self.piece_moved == "wp" and self.end_row == 0) or (
-                self.piece_moved == "bp" and self.end_row == 7)
+        self.is_pawn_promotion = (piece_moved == "wp" and end_row == 0) or (piece_moved == "bp" and end_row == 7)
         # en passant
         self.is_enpassant_move = is_enpassant_move
-        if self.is_enpassant_move:
-            self.piece_captured = "wp" if self.piece_moved == "bp" else "bp"
+        if is_enpassant_move:
+            self.piece_captured = "wp" if piece_moved == "bp" else "bp"
+        else:
+            self.piece_captured = board[end_row][end_col]
         # castle move
         self.is_castle_move = is_castle_move
+        # start square in the high 6 bits, end square in the low 6 bits
+        self.moveID = (start_row * 8 + start_col) << 6 | (end_row * 8 + end_col)
 
-        self.is_capture = self.piece_captured != "--"
-        self.moveID = self.start_row * 1000 + self.start_col * 100 + self.end_row * 10 + self.end_col
+    @property
+    def is_capture(self):
+        return self.piece_captured != "--"
 
     def __eq__(self, other):
         """
@@ -585,6 +1324,9 @@ class Move:
             return self.moveID == other.moveID
         return False
 
+    def __hash__(self):
+        return self.moveID
+
     def getChessNotation(self):
         if self.is_pawn_promotion:
             return self.getRankFile(self.end_row, self.end_col) + "Q"
@@ -2,9 +2,8 @@
 # Sử dụng Pygame để tạo giao diện đồ họa
 
 import pygame as p
-import ChessEngine, ChessAI
+import ChessEngine, ChessAI, ChessBitboard, ChessWorker
 import sys
-from multiprocessing import Process, Queue
 
 # ===== CẤU HÌNH GIAO DIỆN =====
 BOARD_WIDTH = BOARD_HEIGHT = 640  # Tăng kích thước (cũ: 512)
@@ -14,6 +13,7 @@ DIMENSION = 8
 SQUARE_SIZE = BOARD_HEIGHT // DIMENSION
 MAX_FPS = 60  # Tăng FPS cho mượt hơn
 IMAGES = {}
+USE_BITBOARD_ENGINE = True  # False = sinh nước đi trên bàn cờ 8x8 gốc của ChessEngine
 
 # ===== BẢNG MÀU - MULTIPLE THEMES =====
 THEMES = {
@@ -93,6 +93,13 @@ def get_colors():
     }
 
 
+def newGameState():
+    """Tạo ván cờ mới với backend sinh nước đi đã chọn"""
+    if USE_BITBOARD_ENGINE:
+        return ChessBitboard.BitboardGameState()
+    return ChessEngine.GameState()
+
+
 def loadImages():
     """Tải hình ảnh các quân cờ từ thư mục images"""
     pieces = ['wp', 'wR', 'wN', 'wB', 'wK', 'wQ', 'bp', 'bR', 'bN', 'bB', 'bK', 'bQ']
@@ -161,7 +168,7 @@ def showDifficultyMenu(screen, clock):
         'easy': "Dành cho người mới bắt đầu",
         'medium': "Thử thách vừa phải",
         'hard': "Dành cho người có kinh nghiệm",
-        'very_hard': "Cực kỳ khó - AI suy nghĩ lâu"
+        'very_hard': "Cực kỳ khó - AI suy nghĩ tối đa 5 giây"
     }
     
     # Card dimensions - Tăng kích thước để không vỡ chữ
@@ -273,7 +280,7 @@ def showDifficultyMenu(screen, clock):
             screen.blit(name_text, (name_x, card_y + 65))
             
             # Depth info
-            depth_text = desc_font.render(f"Depth: {diff_info['depth']}", True, text_gray)
+            depth_text = desc_font.render(f"Depth: {diff_info['depth']} | {diff_info['time']:g}s", True, text_gray)
             depth_x = card_x + (card_width - depth_text.get_width()) // 2
             screen.blit(depth_text, (depth_x, card_y + 100))
         
@@ -307,7 +314,7 @@ def main():
     screen = p.display.set_mode((BOARD_WIDTH + MOVE_LOG_PANEL_WIDTH, BOARD_HEIGHT))
     clock = p.time.Clock()
     
-    game_state = ChessEngine.GameState()
+    game_state = newGameState()
     valid_moves = game_state.getValidMoves()
     move_made = False
     animate = False
@@ -325,7 +332,8 @@ def main():
     game_over = False
     ai_thinking = False
     move_undone = False
-    move_finder_process = None
+    # tiến trình AI chạy suốt ván cờ, giữ bảng chuyển vị giữa các nước đi
+    engine_worker = ChessWorker.EngineWorker("bitboard" if USE_BITBOARD_ENGINE else "mailbox")
     hover_square = ()  # Ô đang hover
     
     # Fonts
@@ -348,6 +356,7 @@ def main():
         
         for e in p.event.get():
             if e.type == p.QUIT:
+                engine_worker.close()
                 p.quit()
                 sys.exit()
                 
@@ -383,12 +392,13 @@ def main():
                     animate = False
                     game_over = False
                     if ai_thinking:
-                        move_finder_process.terminate()
+                        engine_worker.stop()
                         ai_thinking = False
                     move_undone = True
                     
                 if e.key == p.K_r:  # Reset
-                    game_state = ChessEngine.GameState()
+                    game_state = newGameState()
+                    engine_worker.newGame()
                     valid_moves = game_state.getValidMoves()
                     square_selected = ()
                     player_clicks = []
@@ -396,7 +406,7 @@ def main():
                     animate = False
                     game_over = False
                     if ai_thinking:
-                        move_finder_process.terminate()
+                        engine_worker.stop()
                         ai_thinking = False
                     move_undone = True
                 
@@ -409,7 +419,8 @@ def main():
                 # End game options
                 if game_over:
                     if e.key == p.K_1:  # Chơi lại
-                        game_state = ChessEngine.GameState()
+                        game_state = newGameState()
+                        engine_worker.newGame()
                         valid_moves = game_state.getValidMoves()
                         square_selected = ()
                         player_clicks = []
@@ -417,19 +428,20 @@ def main():
                         animate = False
                         game_over = False
                         if ai_thinking:
-                            move_finder_process.terminate()
+                            engine_worker.stop()
                             ai_thinking = False
                         move_undone = True
                     
                     if e.key == p.K_2:  # Về menu chọn độ khó
                         if ai_thinking:
-                            move_finder_process.terminate()
+                            engine_worker.stop()
                         # Reset và quay về menu
                         selected_difficulty = showDifficultyMenu(screen, clock)
                         if selected_difficulty is None:
                             running = False
                         else:
-                            game_state = ChessEngine.GameState()
+                            game_state = newGameState()
+                            engine_worker.newGame()
                             valid_moves = game_state.getValidMoves()
                             square_selected = ()
                             player_clicks = []
@@ -443,12 +455,12 @@ def main():
         if not game_over and not human_turn and not move_undone:
             if not ai_thinking:
                 ai_thinking = True
-                return_queue = Queue()
-                move_finder_process = Process(target=ChessAI.findBestMove, args=(game_state, valid_moves, return_queue))
-                move_finder_process.start()
+                engine_worker.syncMoves(game_state)  # chỉ gửi các nước đi mới
+                engine_worker.startSearch(ChessAI.current_difficulty)
 
-            if not move_finder_process.is_alive():
-                ai_move = return_queue.get()
+            search_result = engine_worker.poll()
+            if search_result is not None:
+                ai_move = search_result.move
                 if ai_move is None:
                     ai_move = ChessAI.findRandomMove(valid_moves)
                 game_state.makeMove(ai_move)
@@ -502,6 +514,8 @@ def main():
         clock.tick(MAX_FPS)
         p.display.flip()
 
+    engine_worker.close()
+
 
 def drawGameState(screen, game_state, valid_moves, square_selected, hover_square):
     """Vẽ toàn bộ trạng thái game"""
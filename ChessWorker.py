@@ -0,0 +1,244 @@
+"""
+Tiến trình AI chạy suốt ván cờ - thay cho việc tạo một Process mới cho mỗi nước đi của máy.
+Tiến trình giữ bàn cờ và Searcher của nó (bảng chuyển vị còn nguyên giữa các nước), nhận lệnh qua một Pipe:
+chỉ gửi các nước đi mới (move id) và số nước cần undo, hoặc bản ghi nhị phân của thế cờ (to_bytes),
+không gửi lại cả GameState.
+
+    python ChessWorker.py                     # so sánh độ trễ mỗi nước: Process mới / tiến trình chạy sẵn
+    python ChessWorker.py --moves 20 --difficulty medium
+"""
+import argparse
+import sys
+import time
+from multiprocessing import Event, Pipe, Process, Queue
+
+import ChessAI
+from ChessBitboard import BACKENDS
+from ChessEngine import START_FEN
+
+
+class EngineWorker:
+    """
+    Parent side of a long-lived search process. Typical use per AI turn:
+    syncMoves(game_state), startSearch(difficulty), then poll() until it returns the SearchResult.
+    Several workers can run side by side, one per game.
+    """
+
+    def __init__(self, backend="bitboard"):
+        self.connection, worker_connection = Pipe()
+        self.stop_event = Event()
+        self.process = Process(target=workerLoop, args=(worker_connection, backend, self.stop_event), daemon=True)
+        self.process.start()
+        worker_connection.close()
+        self.move_ids = []  # moves the worker has played from its starting position, None when out of sync
+        self.base_moves = 0  # leading move_ids the worker can't undo (played before a setPosition)
+        self.searching = False
+        self.search_start = 0.0
+        self.last_result = None
+        self.last_latency = 0.0  # seconds from startSearch to the result, process overhead included
+
+    def newGame(self, fen=START_FEN):
+        """
+        Start a new game from fen: the worker forgets its position and what its search has learned.
+        """
+        self.connection.send(("new", fen))
+        self.move_ids = []
+        self.base_moves = 0
+
+    def setPosition(self, game_state):
+        """
+        Send the current position of game_state with its repetition history (ChessEngine to_bytes record),
+        for a game that did not start from the worker's position. Later syncs send the moves played after it;
+        the worker can't undo past it.
+        """
+        self.connection.send(("position", game_state.to_bytes()))
+        self.move_ids = [move.moveID for move in game_state.move_log]
+        self.base_moves = len(self.move_ids)
+
+    def syncMoves(self, game_state):
+        """
+        Bring the worker's position up to game_state, which must come from the worker's starting position:
+        only the moves undone and played since the last sync are sent. The whole position is sent instead
+        when the worker reported an error or would have to undo past the position it was given.
+        """
+        if self.move_ids is None:
+            self.setPosition(game_state)
+            return
+        move_ids = [move.moveID for move in game_state.move_log]
+        common = 0
+        for old_id, new_id in zip(self.move_ids, move_ids):
+            if old_id != new_id:
+                break
+            common += 1
+        if common < self.base_moves:
+            self.setPosition(game_state)
+            return
+        if common == len(self.move_ids) == len(move_ids):
+            return
+        self.connection.send(("sync", len(self.move_ids) - common, move_ids[common:]))
+        self.move_ids = move_ids
+
+    def startSearch(self, difficulty=None, time_limit=None, max_search_depth=None, remaining=None, increment=0.0,
+                    moves_to_go=None):
+        """
+        Start searching the synced position and return at once; poll() gives the result.
+        remaining, increment and moves_to_go: the engine's clock when there is no time_limit (see ChessAI.allocateTime).
+        """
+        self.stop_event.clear()
+        self.connection.send(("go", difficulty or ChessAI.current_difficulty, time_limit, max_search_depth,
+                              remaining, increment, moves_to_go))
+        self.searching = True
+        self.search_start = time.perf_counter()
+
+    def poll(self, timeout=0.0):
+        """
+        The SearchResult of the running search once it is ready, else None (waits up to timeout seconds).
+        If the worker failed, the result has no move and its error; the next sync resends the whole position.
+        """
+        if not self.searching or not self.connection.poll(timeout):
+            return None
+        self.last_result = self.connection.recv()
+        self.last_latency = time.perf_counter() - self.search_start
+        self.searching = False
+        if self.last_result.error is not None:
+            self.move_ids = None
+        return self.last_result
+
+    def search(self, game_state, difficulty=None, time_limit=None, max_search_depth=None, remaining=None,
+               increment=0.0, moves_to_go=None):
+        """
+        Sync, search and wait for the result.
+        """
+        self.syncMoves(game_state)
+        self.startSearch(difficulty, time_limit, max_search_depth, remaining, increment, moves_to_go)
+        return self.poll(None)
+
+    def stop(self):
+        """
+        Stop the running search (see Searcher.stop) and return its result, the best move found so far.
+        """
+        if not self.searching:
+            return None
+        self.stop_event.set()
+        return self.poll(None)
+
+    def close(self):
+        self.stop()
+        self.connection.send(("quit",))
+        self.process.join()
+        self.connection.close()
+
+
+def workerLoop(connection, backend, stop_event):
+    """
+    Body of the worker process: apply the commands of EngineWorker until "quit".
+    A command that fails leaves the position in doubt: every "go" answers with the error and no move
+    until a "position" or "new" command sets the position again.
+    """
+    state_class = BACKENDS[backend]
+    game_state = state_class.from_fen(START_FEN)
+    searcher = ChessAI.Searcher(stop_event=stop_event)
+    error = None
+    while True:
+        command = connection.recv()
+        if command[0] == "quit":
+            break
+        try:
+            if command[0] == "go":
+                searcher.difficulty, time_limit, max_search_depth, remaining, increment, moves_to_go = command[1:]
+                if error is None:
+                    connection.send(searcher.search(game_state, time_limit=time_limit,
+                                                    max_search_depth=max_search_depth, remaining=remaining,
+                                                    increment=increment, moves_to_go=moves_to_go))
+                else:
+                    connection.send(ChessAI.SearchResult(None, 0, [], 0, 0, 0, 0, 0.0, error=error))
+            elif command[0] == "sync" and error is None:
+                if command[1] > len(game_state.move_log):
+                    raise ValueError(f"can't undo {command[1]} moves, the worker has played {len(game_state.move_log)}")
+                for _ in range(command[1]):
+                    game_state.undoMove()
+                for move_id in command[2]:
+                    for move in game_state.getValidMoves():
+                        if move.moveID == move_id:
+                            game_state.makeMove(move)
+                            break
+                    else:
+                        raise ValueError(f"move id {move_id} is not legal in the worker's position")
+            elif command[0] == "position":
+                game_state.loadBytes(command[1])
+                error = None
+            elif command[0] == "new":
+                game_state = state_class.from_fen(command[1])
+                searcher.reset()
+                error = None
+        except Exception as exception:  # keep the process alive, the parent resyncs the position
+            error = f"{command[0]}: {exception!r}"
+            if command[0] == "go":
+                connection.send(ChessAI.SearchResult(None, 0, [], 0, 0, 0, 0, 0.0, error=error))
+    searcher.close()
+    connection.close()
+
+
+def playPerProcess(game_state, moves, difficulty, max_search_depth):
+    """
+    Play moves the old way, a new Process and Queue per move. Returns the seconds per move.
+    """
+    ChessAI.set_difficulty(difficulty)
+    latencies = []
+    for _ in range(moves):
+        start_time = time.perf_counter()
+        return_queue = Queue()
+        process = Process(target=ChessAI.findBestMove, args=(game_state, game_state.getValidMoves(), return_queue),
+                          kwargs={'max_search_depth': max_search_depth})
+        process.start()
+        move = return_queue.get()
+        process.join()
+        latencies.append(time.perf_counter() - start_time)
+        game_state.makeMove(move)
+    return latencies
+
+
+def playWithWorker(game_state, moves, difficulty, max_search_depth, backend):
+    """
+    Play moves with one EngineWorker. Returns the seconds per move and the search seconds per move.
+    """
+    worker = EngineWorker(backend)
+    latencies = []
+    search_times = []
+    for _ in range(moves):
+        result = worker.search(game_state, difficulty, max_search_depth=max_search_depth)
+        latencies.append(worker.last_latency)
+        search_times.append(result.elapsed)
+        for move in game_state.getValidMoves():
+            if move == result.move:
+                game_state.makeMove(move)
+                break
+    worker.close()
+    return latencies, search_times
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-move latency: new Process per move against a persistent worker")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="bitboard")
+    parser.add_argument("--moves", type=int, default=10, help="moves played from the start position")
+    parser.add_argument("--difficulty", choices=ChessAI.DIFFICULTY_ORDER, default="easy")
+    parser.add_argument("--depth", type=int, help="fixed search depth instead of the difficulty's")
+    args = parser.parse_args()
+    state_class = BACKENDS[args.backend]
+
+    start_time = time.perf_counter()
+    latencies = playPerProcess(state_class.from_fen(START_FEN), args.moves, args.difficulty, args.depth)
+    print(f"process per move    {1000 * sum(latencies) / len(latencies):8.1f} ms/move"
+          f"  ({time.perf_counter() - start_time:.2f}s total)")
+    start_time = time.perf_counter()
+    latencies, search_times = playWithWorker(state_class.from_fen(START_FEN), args.moves, args.difficulty,
+                                             args.depth, args.backend)
+    overhead = (sum(latencies) - sum(search_times)) / len(latencies)
+    print(f"persistent worker   {1000 * sum(latencies) / len(latencies):8.1f} ms/move"
+          f"  ({time.perf_counter() - start_time:.2f}s total, worker start included)"
+          f"  overhead {1000 * overhead:.1f} ms/move")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,212 @@
+"""
+Bench - đo tốc độ tìm kiếm của AI trên một bộ vị trí cố định, ở độ sâu cố định và không giới hạn thời gian.
+Số nút giống nhau giữa các lần chạy, nên có thể dùng để so sánh các thay đổi của thuật toán tìm kiếm.
+
+    python bench.py                      # độ sâu 4, backend bitboard
+    python bench.py --depth 5 --compare  # so sánh khi tắt và bật PVS + aspiration windows
+    python bench.py --threads 1,2,4,8    # Lazy SMP: thời gian và tốc độ tăng theo số tiến trình
+    python bench.py --root-split 4       # chia nước đi gốc cho 4 tiến trình, kiểm tra cùng nước đi với tìm tuần tự
+                                         # (bộ vị trí chuẩn và --random-positions vị trí ngẫu nhiên)
+    python bench.py --serialization      # kích thước & thời gian: pickle GameState / to_bytes + from_bytes
+"""
+import argparse
+import pickle
+import random
+import sys
+import timeit
+
+import ChessAI
+from ChessBitboard import BACKENDS
+
+BENCH_POSITIONS = [
+    ("start position", "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"),
+    ("italian", "r1bqkb1r/pppp1ppp/2n2n2/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4"),
+    ("queen's gambit declined", "rnbqkb1r/ppp2ppp/4pn2/3p2B1/2PP4/2N5/PP2PPPP/R2QKBNR b KQkq - 3 4"),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"),
+    ("position 6", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10"),
+    ("open middlegame", "r2q1rk1/pp2bppp/2n1bn2/3p4/3P4/2NBBN2/PP3PPP/R2Q1RK1 w - - 0 11"),
+    ("rook endgame", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1"),
+    ("pawn endgame", "8/5pk1/6p1/8/3K4/6P1/5P2/8 w - - 0 1"),
+]
+
+
+def runBench(state_class, depth, searcher=None, **search_options):
+    """
+    Search every bench position and return (main nodes, quiescence nodes, seconds, best moves) over the whole set.
+    search_options are passed on to Searcher.search.
+    """
+    if searcher is None:
+        searcher = ChessAI.Searcher()
+    total_nodes = total_quiescence_nodes = 0
+    total_time = 0.0
+    best_moves = []
+    for name, fen in BENCH_POSITIONS:
+        searcher.reset()
+        game_state = state_class.from_fen(fen)
+        result = searcher.search(game_state, time_limit=float("inf"), max_search_depth=depth, **search_options)
+        elapsed = result.elapsed
+        nodes = result.nodes + result.quiescence_nodes + result.helper_nodes
+        print(f"{name:<26} {str(result.move):<7} nodes {result.nodes:>8} + {result.quiescence_nodes:>8} q"
+              f"  {elapsed:8.3f}s  {int(nodes / elapsed) if elapsed > 0 else 0:>7} nps"
+              f"  pv {' '.join(str(move) for move in result.pv)}")
+        total_nodes += result.nodes
+        total_quiescence_nodes += result.quiescence_nodes
+        total_time += elapsed
+        best_moves.append(str(result.move))
+    print(f"{'total':<34} nodes {total_nodes:>8} + {total_quiescence_nodes:>8} q  {total_time:8.3f}s")
+    return total_nodes, total_quiescence_nodes, total_time, best_moves
+
+
+def runScaleTest(state_class, depth, thread_counts):
+    """
+    Run the bench once per process count and report the time to reach the depth and the speedup over the first count.
+    """
+    timings = []
+    for threads in thread_counts:
+        ChessAI.SEARCH_THREADS = threads
+        print(f"{threads} process(es)")
+        timings.append(runBench(state_class, depth)[2])
+    for threads, elapsed in zip(thread_counts, timings):
+        print(f"{threads:>3} process(es)  {elapsed:8.3f}s  speedup {timings[0] / elapsed:5.2f}x")
+    return 0
+
+
+def randomPositions(state_class, count, seed=1):
+    """
+    Game states of count positions reached by random legal moves from the bench positions, none of them
+    game over. The moves stay in the states, so their evaluation totals are the incrementally updated ones.
+    """
+    rng = random.Random(seed)
+    game_states = []
+    while len(game_states) < count:
+        game_state = state_class.from_fen(rng.choice(BENCH_POSITIONS)[1])
+        for _ in range(rng.randint(2, 16)):
+            moves = game_state.getValidMoves()
+            if not moves:
+                break
+            game_state.makeMove(rng.choice(moves))
+        if game_state.getValidMoves():
+            game_states.append(game_state)
+    return game_states
+
+
+def runRootSplitCheck(state_class, depth, workers, random_positions=0, random_depth=2):
+    """
+    Run the reproducible search in one process, then split over the given number of processes, and return 1
+    if a position gets a different move. The random positions are then searched at random_depth both ways,
+    and must get the same move and exactly the same score.
+    """
+    print("reproducible, 1 process")
+    _, _, base_time, base_moves = runBench(state_class, depth, reproducible=True)
+    print(f"root split, {workers} process(es)")
+    searcher = ChessAI.Searcher()
+    _, _, elapsed, moves = runBench(state_class, depth, searcher, root_split_workers=workers)
+    mismatches = [name for (name, _), base_move, move in zip(BENCH_POSITIONS, base_moves, moves) if base_move != move]
+    print(f"time {base_time:.2f}s -> {elapsed:.2f}s  speedup {base_time / elapsed:5.2f}x")
+    base_searcher = ChessAI.Searcher()
+    for game_state in randomPositions(state_class, random_positions):
+        base = base_searcher.search(game_state, time_limit=float("inf"), max_search_depth=random_depth,
+                                    reproducible=True)
+        result = searcher.search(game_state, time_limit=float("inf"), max_search_depth=random_depth,
+                                 root_split_workers=workers)
+        if (base.move, base.score) != (result.move, result.score):
+            fen = game_state.to_fen()
+            print(f"{fen}  {base.move} {base.score!r} / {result.move} {result.score!r}")
+            mismatches.append(fen)
+    if random_positions:
+        print(f"{random_positions} random positions at depth {random_depth}: "
+              f"{len(mismatches) - sum(name in dict(BENCH_POSITIONS) for name in mismatches)} different")
+    searcher.close()
+    if mismatches:
+        print("different move: " + ", ".join(mismatches))
+    return 1 if mismatches else 0
+
+
+def runSerializationBench(state_class, plies=8, repeat=200):
+    """
+    Payload size and microseconds to encode and decode each bench position (after a few plies, so it has a move
+    log and repetition history) with pickle and with to_bytes / from_bytes.
+    """
+    pickle_total = bytes_total = 0.0
+    for name, fen in BENCH_POSITIONS:
+        game_state = state_class.from_fen(fen)
+        for _ in range(plies):
+            moves = game_state.getValidMoves()
+            if not moves:
+                break
+            game_state.makeMove(moves[len(moves) // 2])
+        pickled = pickle.dumps(game_state)
+        record = game_state.to_bytes()
+        restored = state_class.from_bytes(record)
+        if restored.to_fen() != game_state.to_fen() or restored.zobrist_key != game_state.zobrist_key:
+            print(f"{name}: to_bytes / from_bytes changed the position")
+            return 1
+        pickle_time = (timeit.timeit(lambda: pickle.dumps(game_state), number=repeat) +
+                       timeit.timeit(lambda: pickle.loads(pickled), number=repeat)) * 1e6 / repeat
+        bytes_time = (timeit.timeit(game_state.to_bytes, number=repeat) +
+                      timeit.timeit(lambda: state_class.from_bytes(record), number=repeat)) * 1e6 / repeat
+        pickle_total += pickle_time
+        bytes_total += bytes_time
+        print(f"{name:<26} pickle {len(pickled):>6} B {pickle_time:7.1f} us   "
+              f"to_bytes {len(record):>4} B {bytes_time:7.1f} us")
+    print(f"{'total':<26} pickle {pickle_total:19.1f} us   to_bytes {bytes_total:17.1f} us  "
+          f"({pickle_total / bytes_total:.1f}x faster)")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fixed-depth search benchmark")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="bitboard")
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument("--no-pvs", action="store_true", help="search every move with the full window")
+    parser.add_argument("--no-aspiration", action="store_true", help="open every depth with the full window")
+    parser.add_argument("--difficulty", choices=ChessAI.DIFFICULTY_ORDER, default="hard",
+                        help="difficulty whose null_move / lmr settings are used")
+    parser.add_argument("--no-null-move", action="store_true", help="turn null-move pruning off")
+    parser.add_argument("--no-lmr", action="store_true", help="turn late move reductions off")
+    parser.add_argument("--threads", help="comma-separated process counts for a Lazy SMP scale test, e.g. 1,2,4")
+    parser.add_argument("--root-split", type=int, metavar="N",
+                        help="split the root moves over N processes and check the moves against one process")
+    parser.add_argument("--random-positions", type=int, default=40, metavar="N",
+                        help="with --root-split, also check N random positions")
+    parser.add_argument("--random-depth", type=int, default=2, help="search depth of the random positions")
+    parser.add_argument("--serialization", action="store_true",
+                        help="compare pickle with to_bytes / from_bytes on the bench positions")
+    parser.add_argument("--compare", action="store_true",
+                        help="run once without PVS and aspiration windows and once with them")
+    args = parser.parse_args()
+    state_class = BACKENDS[args.backend]
+    ChessAI.set_difficulty(args.difficulty)
+    difficulty = ChessAI.DIFFICULTY_LEVELS[args.difficulty]
+    if args.no_null_move:
+        difficulty['null_move'] = False
+    if args.no_lmr:
+        difficulty['lmr'] = False
+
+    if args.serialization:
+        return runSerializationBench(state_class)
+    if args.threads:
+        return runScaleTest(state_class, args.depth, [int(count) for count in args.threads.split(",")])
+    if args.root_split:
+        return runRootSplitCheck(state_class, args.depth, args.root_split, args.random_positions, args.random_depth)
+
+    if not args.compare:
+        runBench(state_class, args.depth, ChessAI.Searcher(use_pvs=not args.no_pvs,
+                                                           use_aspiration=not args.no_aspiration))
+        return 0
+
+    print("without PVS / aspiration windows")
+    base_nodes, base_quiescence_nodes, base_time, _ = runBench(state_class, args.depth,
+                                                               ChessAI.Searcher(use_pvs=False, use_aspiration=False))
+    print("with PVS / aspiration windows")
+    nodes, quiescence_nodes, elapsed, _ = runBench(state_class, args.depth,
+                                                   ChessAI.Searcher(use_pvs=True, use_aspiration=True))
+    base_total = base_nodes + base_quiescence_nodes
+    print(f"nodes {base_total} -> {nodes + quiescence_nodes} "
+          f"({100 * (nodes + quiescence_nodes - base_total) / base_total:+.1f}%), "
+          f"time {base_time:.2f}s -> {elapsed:.2f}s ({100 * (elapsed - base_time) / base_time:+.1f}%)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+"""
+Perft - đếm số nút lá của cây nước đi để kiểm tra và đo tốc độ bộ sinh nước đi.
+So sánh với số nút đã biết của các vị trí chuẩn (Chess Programming Wiki), thoát với mã 1 nếu có sai lệch.
+
+    python perft.py                                    # chạy bộ vị trí chuẩn đến độ sâu 3
+    python perft.py --max-depth 4 --backend mailbox
+    python perft.py --fen "<FEN>" --depth 3 --divide   # số nút theo từng nước đi đầu tiên
+"""
+import argparse
+import sys
+import time
+
+from ChessBitboard import BACKENDS
+
+# (name, FEN, node counts for depth 1, 2, ...)
+# The engine only promotes to a queen, so each list stops before the first depth with a promotion.
+REFERENCE_POSITIONS = [
+    ("start position", "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+     [20, 400, 8902, 197281, 4865609]),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+     [48, 2039, 97862]),
+    ("position 3", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+     [14, 191, 2812, 43238, 674624]),
+    ("position 6", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+     [46, 2079, 89890]),
+    ("castling", "r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1",
+     [26, 568, 13744, 314346]),
+    ("castling rights lost by capture", "r3k2r/1b4bq/8/8/8/8/7B/R3K2R w KQkq - 0 1",
+     [26, 1141, 27826]),
+    ("short castling gives check", "5k2/8/8/8/8/8/8/4K2R w K - 0 1",
+     [15, 66, 1198, 6399, 120330]),
+    ("long castling gives check", "3k4/8/8/8/8/8/8/R3K3 w Q - 0 1",
+     [16, 71, 1286, 7418, 141077]),
+    ("en passant discovers check", "8/8/1k6/2b5/2pP4/8/5K2/8 b - d3 0 1",
+     [15, 126, 1928, 13931]),
+    ("illegal en passant", "3k4/3p4/8/K1P4r/8/8/8/8 b - - 0 1",
+     [18, 92, 1670, 10138, 185429]),
+    ("en passant gives check", "8/8/4k3/8/2p5/8/B2P2K1/8 w - - 0 1",
+     [13, 102, 1266, 10276, 135655]),
+    ("double check", "8/8/2k5/5q2/5n2/8/5K2/8 b - - 0 1",
+     [37, 183, 6559, 23527]),
+    ("pawn pinned on its file", "8/8/8/4K3/8/4P3/8/k3r3 w - - 0 1",
+     [9, 100, 746, 11182]),
+    ("queen pinned on a diagonal", "rnb1kbnr/pp1ppppp/2p5/q7/3P4/8/PPPQPPPP/RNB1KBNR w KQkq - 2 3",
+     [23, 772, 20547, 640310]),
+]
+
+
+def moveToUci(move):
+    """
+    Coordinate notation (e2e4, e7e8q) so divide output can be compared with other engines.
+    """
+    uci = move.getRankFile(move.start_row, move.start_col) + move.getRankFile(move.end_row, move.end_col)
+    return uci + "q" if move.is_pawn_promotion else uci
+
+
+def perft(game_state, depth):
+    """
+    Number of leaf nodes of the legal move tree to the given depth.
+    """
+    if depth == 0:
+        return 1
+    moves = game_state.getValidMoves()
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        game_state.makeMove(move)
+        nodes += perft(game_state, depth - 1)
+        game_state.undoMove()
+    return nodes
+
+
+def divide(game_state, depth):
+    """
+    Perft split by root move, as a list of (move, nodes).
+    """
+    results = []
+    for move in game_state.getValidMoves():
+        game_state.makeMove(move)
+        results.append((moveToUci(move), perft(game_state, depth - 1)))
+        game_state.undoMove()
+    return results
+
+
+def timedPerft(game_state, depth):
+    start_time = time.perf_counter()
+    nodes = perft(game_state, depth)
+    elapsed = time.perf_counter() - start_time
+    return nodes, elapsed
+
+
+def formatResult(name, depth, nodes, elapsed, expected=None):
+    nps = int(nodes / elapsed) if elapsed > 0 else 0
+    line = f"{name:<34} depth {depth}  nodes {nodes:>9}  {elapsed:8.3f}s  {nps:>8} nps"
+    if expected is not None:
+        line += "  OK" if nodes == expected else f"  FAIL (expected {expected})"
+    return line
+
+
+def runSuite(state_class, max_depth):
+    """
+    Run every reference position up to max_depth and return the number of mismatches.
+    """
+    failures = 0
+    total_nodes = 0
+    total_time = 0.0
+    for name, fen, counts in REFERENCE_POSITIONS:
+        for depth, expected in enumerate(counts[:max_depth], start=1):
+            nodes, elapsed = timedPerft(state_class.from_fen(fen), depth)
+            total_nodes += nodes
+            total_time += elapsed
+            if nodes != expected:
+                failures += 1
+            print(formatResult(name, depth, nodes, elapsed, expected))
+    print(formatResult("total", max_depth, total_nodes, total_time))
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Perft move generator test and benchmark")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="bitboard")
+    parser.add_argument("--max-depth", type=int, default=3, help="deepest depth run for the reference positions")
+    parser.add_argument("--fen", help="run a single position instead of the reference set")
+    parser.add_argument("--depth", type=int, default=3, help="depth for --fen")
+    parser.add_argument("--expected", type=int, help="expected node count for --fen")
+    parser.add_argument("--divide", action="store_true", help="print node counts per root move for --fen")
+    args = parser.parse_args()
+    state_class = BACKENDS[args.backend]
+
+    if args.fen is None:
+        failures = runSuite(state_class, args.max_depth)
+        if failures:
+            print(f"{failures} mismatch(es)")
+        return 1 if failures else 0
+
+    game_state = state_class.from_fen(args.fen)
+    if args.divide:
+        start_time = time.perf_counter()
+        results = divide(game_state, args.depth)
+        elapsed = time.perf_counter() - start_time
+        for uci, nodes in sorted(results):
+            print(f"{uci}: {nodes}")
+        nodes = sum(count for _, count in results)
+        print(formatResult("divide", args.depth, nodes, elapsed, args.expected))
+    else:
+        nodes, elapsed = timedPerft(game_state, args.depth)
+        print(formatResult("perft", args.depth, nodes, elapsed, args.expected))
+    return 1 if args.expected is not None and nodes != args.expected else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())